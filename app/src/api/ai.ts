@@ -28,13 +28,16 @@ export const aiApi = {
       
       const decoder = new TextDecoder();
       let fullText = '';
+      let buffer = '';
       
       while (true) {
         const { done, value } = await reader.read();
         if (done) break;
         
-        const chunk = decoder.decode(value);
-        const lines = chunk.split('\n');
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        // 最后一行可能是被拆到下一次读取的半帧，留到下次读取后再解析
+        buffer = lines.pop() ?? '';
         
         for (const line of lines) {
           if (line.startsWith('data: ')) {
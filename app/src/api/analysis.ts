@@ -21,9 +21,9 @@ export const analysisApi = {
     request.get<ApiResponse<Analysis>>(`/analyses/${id}/result`),
 
   // 获取分析列表
-  list: (page = 1, pageSize = 10) =>
+  list: (page = 1, pageSize = 10, includeResult = true) =>
     request.get<ApiResponse<{total: number, items: Analysis[]}>>(`/analyses`, {
-      params: { page, page_size: pageSize }
+      params: { page, page_size: pageSize, include_result: includeResult }
     }),
 
   // 获取数据集的所有分析
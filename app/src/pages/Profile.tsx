@@ -73,7 +73,8 @@ export function Profile() {
         setLoading(true);
         const [datasetsRes, analysesRes] = await Promise.all([
           datasetApi.list(1, 1000),
-          analysisApi.list(1, 1000),
+          // 只统计数量和状态，不需要分析结果
+          analysisApi.list(1, 1000, false),
         ]);
         
         const datasets = (datasetsRes as any)?.items || [];
@@ -1,14 +1,19 @@
 """AI智能分析接口"""
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Request, Response
 from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-import json
+import asyncio
+import hashlib
+import time
 import uuid
+import orjson
 from datetime import datetime
+from collections import OrderedDict
+from typing import Dict, Any, Tuple
 
-from app.core.database import get_db
+from app.core.database import get_db, AsyncSessionLocal
 from app.core.config import settings
+from app.core.executor import run_in_parse_pool
 from app.models import Dataset
 from app.schemas.base import ResponseModel
 from app.schemas.ai import (
@@ -17,39 +22,252 @@ from app.schemas.ai import (
     QuestionRequest, QuestionResponse,
     ChatRequest
 )
-from app.services.ai_service import ai_service
+from app.services.ai_service import ai_service, MAX_DIGEST_COLUMNS
 import pandas as pd
+import os
+import random
+from functools import lru_cache
 from pathlib import Path
-from app.api.v1.endpoints.datasets import read_csv_with_auto_header
+from app.api.v1.endpoints.datasets import (
+    read_csv_with_auto_header, _has_header, _iter_xlsx_rows, _xlsx_rows_to_frame
+)
 
 router = APIRouter()
 
+# AI 分析使用的最大采样行数，避免token过多
+MAX_SAMPLE_ROWS = 1000
+
+# SSE 流式输出的合并阈值：累计字符数 / 距上次发送的秒数
+SSE_FLUSH_SIZE = 64
+SSE_FLUSH_INTERVAL = 0.02
+
+# SSE 数据帧的固定前后缀，只需对文本本身做 JSON 编码
+_SSE_CHUNK_PREFIX = b'data: {"chunk":'
+_SSE_CHUNK_SUFFIX = b',"finished":false}\n\n'
+_SSE_DONE_FRAME = b'data: {"chunk":"","finished":true}\n\n'
+
+
+def _sse_chunk_frame(text: str) -> bytes:
+    """构造一个未结束的 SSE 数据帧"""
+    return _SSE_CHUNK_PREFIX + orjson.dumps(text) + _SSE_CHUNK_SUFFIX
+
+
+def _read_excel_sampled(file_path: str, cap: int = MAX_SAMPLE_ROWS) -> pd.DataFrame:
+    """
+    流式读取 .xlsx 并做蓄水池采样
+    逐行读取和单元格取值与 _read_excel_fast 相同（第一个工作表、同样的类型转换），
+    只保留 cap 行样本，内存占用与 cap 成正比
+    """
+    from contextlib import closing
+    
+    # Vitter 蓄水池采样（算法R），固定种子保证结果可复现
+    rng = random.Random(42)
+    reservoir = []
+    seen = 0
+    # 暂未计入的空行数：后面还有数据时才计入，与 pandas 一样去掉末尾的空行
+    pending_blank = 0
+    
+    with closing(_iter_xlsx_rows(file_path)) as rows:
+        header = next(rows, None)
+        if header is None:
+            return pd.DataFrame()
+        total_columns = len(header)
+        
+        for row in rows:
+            if not row:
+                pending_blank += 1
+                continue
+            total_columns = max(total_columns, len(row))
+            # 过宽的表只保留前 MAX_DIGEST_COLUMNS 列
+            for sample in [[]] * pending_blank + [row[:MAX_DIGEST_COLUMNS]]:
+                if seen < cap:
+                    reservoir.append(sample)
+                else:
+                    j = rng.randint(0, seen)
+                    if j < cap:
+                        reservoir[j] = sample
+                seen += 1
+            pending_blank = 0
+    
+    if not header and not reservoir:
+        return pd.DataFrame()
+    
+    # 表头补齐到全表宽度，未被抽中的宽行中的列也保留，列与 pd.read_excel 一致
+    width = min(total_columns, MAX_DIGEST_COLUMNS)
+    header = header[:width] + [""] * (width - len(header))
+    df = _xlsx_rows_to_frame([header] + reservoir)
+    df.attrs["total_columns"] = total_columns
+    return df
+
+
+def _estimate_csv_rows(file_path: str, probe_size: int = 65536) -> int:
+    """根据文件头部的平均行长估算 CSV 行数"""
+    with open(file_path, "rb") as f:
+        head = f.read(probe_size)
+    lines = head.count(b"\n")
+    if len(head) < probe_size:
+        # 文件不足一个探测块，已读全
+        return lines
+    if lines == 0:
+        return 0
+    return int(os.path.getsize(file_path) / (len(head) / lines))
+
+
+def _read_csv_sampled(file_path: str) -> pd.DataFrame:
+    """读取 CSV 文件，过宽或过大的文件只解析需要的部分"""
+    read_kwargs = {}
+    # 表头只检测一次，后续读取直接传入
+    has_header = _has_header(file_path)
+    # 先只读表头，过宽的文件只解析前 MAX_DIGEST_COLUMNS 列
+    total_columns = len(read_csv_with_auto_header(file_path, nrows=0, has_header=has_header).columns)
+    if total_columns > MAX_DIGEST_COLUMNS:
+        read_kwargs["usecols"] = range(MAX_DIGEST_COLUMNS)
+    # 大文件只读取前 MAX_SAMPLE_ROWS 行，不再解析文件尾部
+    # 仅对有表头的文件启用，保持与 read_csv_with_auto_header 的表头检测一致
+    if _estimate_csv_rows(file_path) > MAX_SAMPLE_ROWS and has_header:
+        read_kwargs["nrows"] = MAX_SAMPLE_ROWS
+    
+    df = read_csv_with_auto_header(
+        file_path, engine="c", low_memory=False, has_header=has_header, **read_kwargs
+    )
+    
+    df.attrs["total_columns"] = total_columns
+    return df
+
+
+# 按扩展名选择读取函数
+# openpyxl 不支持旧版 .xls，仍由 pandas（xlrd）整表读取
+_READERS = {
+    ".csv": _read_csv_sampled,
+    ".xlsx": _read_excel_sampled,
+    ".xls": pd.read_excel,
+}
+
+
+@lru_cache(maxsize=32)
+def _load_sampled(file_path: str, mtime: float) -> pd.DataFrame:
+    """
+    读取并采样数据文件（带缓存）
+    以 (路径, 修改时间) 为键，文件未变化时直接返回内存中的采样结果
+    """
+    ext = Path(file_path).suffix.lower()
+    reader = _READERS.get(ext)
+    if reader is None:
+        raise ValueError(f"不支持的文件格式: {ext}")
+    
+    df = reader(file_path)
+    total_columns = df.attrs.get("total_columns", len(df.columns))
+    
+    # 限制列数，避免解析和提示词过大
+    if len(df.columns) > MAX_DIGEST_COLUMNS:
+        df = df.iloc[:, :MAX_DIGEST_COLUMNS]
+    
+    # 限制数据量，避免token过多
+    # 使用等间隔的系统抽样：无需随机索引和额外拷贝，且保持原始行序，多次运行结果一致
+    if len(df) > MAX_SAMPLE_ROWS:
+        step = max(1, len(df) // MAX_SAMPLE_ROWS)
+        df = df.iloc[::step].head(MAX_SAMPLE_ROWS)
+    
+    # 记录原始列数，生成摘要时提示列已被截断
+    df.attrs["total_columns"] = total_columns
+    return df
+
+
+# 从文件生成的AI摘要缓存，键为 (路径, 修改时间)
+# 回写数据库完成前的并发请求可直接复用，无需再次解析和汇总
+_DIGEST_CACHE: "OrderedDict[Tuple[str, float], Dict[str, Any]]" = OrderedDict()
+_DIGEST_CACHE_SIZE = 32
+
+# 正在生成中的摘要任务，同一文件的并发请求共享同一个任务，只解析一次
+_DIGEST_INFLIGHT: Dict[Tuple[str, float], "asyncio.Task"] = {}
+
+
+def clear_dataset_cache():
+    """清空数据集采样缓存（数据集更新/删除时调用）"""
+    _load_sampled.cache_clear()
+    _DIGEST_CACHE.clear()
+
 
 def load_dataset_file(dataset: Dataset) -> pd.DataFrame:
     """加载数据集文件"""
     file_path = dataset.storage_path
-    ext = Path(file_path).suffix.lower()
     
     try:
-        if ext == ".csv":
-            df = read_csv_with_auto_header(file_path)
-        elif ext in [".xlsx", ".xls"]:
-            df = pd.read_excel(file_path)
-        else:
-            raise ValueError(f"不支持的文件格式: {ext}")
-        
-        # 限制数据量，避免token过多
-        if len(df) > 1000:
-            df = df.sample(1000, random_state=42)
-        
-        return df
+        mtime = os.path.getmtime(file_path)
+        # 浅拷贝，避免调用方修改缓存中的 DataFrame
+        return _load_sampled(file_path, mtime).copy(deep=False)
     except Exception as e:
         raise HTTPException(500, detail=f"读取数据文件失败: {str(e)}")
 
 
+async def get_dataset_or_404(db: AsyncSession, dataset_id: str) -> Dataset:
+    """获取未删除的数据集，不存在时返回404"""
+    # 按主键获取，会话内已加载过的对象直接从 identity map 返回
+    dataset = await db.get(Dataset, dataset_id)
+    if dataset is None or dataset.is_deleted:
+        raise HTTPException(404, detail="数据集不存在")
+    return dataset
+
+
+async def _save_dataset_digest(dataset_id: str, digest: Dict[str, Any]):
+    """
+    回写数据集AI摘要
+    作为后台任务在响应返回后执行，需要自己创建数据库会话
+    """
+    async with AsyncSessionLocal() as db:
+        dataset = await db.get(Dataset, dataset_id)
+        if dataset is not None:
+            dataset.ai_digest = digest
+            await db.commit()
+
+
+async def get_dataset_digest(dataset: Dataset, background_tasks: BackgroundTasks) -> Dict[str, Any]:
+    """
+    获取数据集的AI摘要
+    摘要在上传时生成；旧数据集首次访问时从文件生成，并在后台回写数据库
+    """
+    if dataset.ai_digest:
+        return dataset.ai_digest
+    
+    try:
+        key = (dataset.storage_path, os.path.getmtime(dataset.storage_path))
+    except OSError as e:
+        raise HTTPException(500, detail=f"读取数据文件失败: {str(e)}")
+    
+    digest = _DIGEST_CACHE.get(key)
+    if digest is not None:
+        _DIGEST_CACHE.move_to_end(key)
+        return digest
+    
+    task = _DIGEST_INFLIGHT.get(key)
+    if task is not None:
+        # 已有请求在生成摘要，等待其结果即可，回写由发起者负责
+        return await asyncio.shield(task)
+    
+    task = asyncio.create_task(_build_file_digest(dataset, key))
+    _DIGEST_INFLIGHT[key] = task
+    task.add_done_callback(lambda _: _DIGEST_INFLIGHT.pop(key, None))
+    # shield：发起请求被取消时，任务继续执行，不影响其他等待者
+    digest = await asyncio.shield(task)
+    
+    background_tasks.add_task(_save_dataset_digest, dataset.id, digest)
+    return digest
+
+
+async def _build_file_digest(dataset: Dataset, key: Tuple[str, float]) -> Dict[str, Any]:
+    """从文件解析并生成摘要，结果写入摘要缓存"""
+    df = await run_in_parse_pool(load_dataset_file, dataset)
+    digest = await ai_service.build_digest_async(df)
+    _DIGEST_CACHE[key] = digest
+    if len(_DIGEST_CACHE) > _DIGEST_CACHE_SIZE:
+        _DIGEST_CACHE.popitem(last=False)
+    return digest
+
+
 @router.post("/interpret", response_model=ResponseModel[DataInterpretationResponse])
 async def interpret_data(
     request: DataInterpretationRequest,
+    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -61,18 +279,13 @@ async def interpret_data(
     - technical: 技术分析视角
     """
     # 获取数据集
-    result = await db.execute(
-        select(Dataset).where(Dataset.id == request.dataset_id, Dataset.is_deleted == False)
-    )
-    dataset = result.scalar_one_or_none()
-    if not dataset:
-        raise HTTPException(404, detail="数据集不存在")
+    dataset = await get_dataset_or_404(db, request.dataset_id)
     
-    # 加载数据
-    df = load_dataset_file(dataset)
+    # 获取数据摘要
+    digest = await get_dataset_digest(dataset, background_tasks)
     
     # 调用AI解读
-    interpretation = await ai_service.interpret_data(df, request.analysis_type)
+    interpretation = await ai_service.interpret_data(digest, request.analysis_type)
     
     return ResponseModel(data=interpretation)
 
@@ -80,6 +293,7 @@ async def interpret_data(
 @router.post("/suggestions", response_model=ResponseModel[SuggestionResponse])
 async def generate_suggestions(
     request: SuggestionRequest,
+    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -88,18 +302,13 @@ async def generate_suggestions(
     根据数据特征推荐适合的分析方法
     """
     # 获取数据集
-    result = await db.execute(
-        select(Dataset).where(Dataset.id == request.dataset_id, Dataset.is_deleted == False)
-    )
-    dataset = result.scalar_one_or_none()
-    if not dataset:
-        raise HTTPException(404, detail="数据集不存在")
+    dataset = await get_dataset_or_404(db, request.dataset_id)
     
-    # 加载数据
-    df = load_dataset_file(dataset)
+    # 获取数据摘要
+    digest = await get_dataset_digest(dataset, background_tasks)
     
     # 生成建议
-    suggestions = await ai_service.generate_suggestions(df, request.context)
+    suggestions = await ai_service.generate_suggestions(digest, request.context)
     
     return ResponseModel(data={"suggestions": suggestions})
 
@@ -107,6 +316,7 @@ async def generate_suggestions(
 @router.post("/ask", response_model=ResponseModel[QuestionResponse])
 async def answer_question(
     request: QuestionRequest,
+    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -115,19 +325,14 @@ async def answer_question(
     用自然语言提问，AI基于数据回答
     """
     # 获取数据集
-    result = await db.execute(
-        select(Dataset).where(Dataset.id == request.dataset_id, Dataset.is_deleted == False)
-    )
-    dataset = result.scalar_one_or_none()
-    if not dataset:
-        raise HTTPException(404, detail="数据集不存在")
+    dataset = await get_dataset_or_404(db, request.dataset_id)
     
-    # 加载数据
-    df = load_dataset_file(dataset)
+    # 获取数据摘要
+    digest = await get_dataset_digest(dataset, background_tasks)
     
     # 回答问题
     answer = await ai_service.answer_question(
-        df, 
+        digest, 
         request.question, 
         request.chat_history or []
     )
@@ -143,12 +348,27 @@ async def chat_stream(request: ChatRequest):
     通用对话接口，支持流式返回
     """
     async def generate():
-        full_text = ""
+        pending = []  # 尚未发送的片段
+        pending_size = 0
+        last_flush = time.monotonic()
+        
         async for chunk in ai_service.chat_stream(request.message, request.chat_history or []):
-            full_text += chunk
-            yield "data: " + json.dumps({"chunk": chunk, "finished": False}) + "\n\n"
+            pending.append(chunk)
+            pending_size += len(chunk)
+            
+            # 攒够一定字数或距上次发送超过一定时间再发送，减少事件数量
+            now = time.monotonic()
+            if pending_size >= SSE_FLUSH_SIZE or now - last_flush >= SSE_FLUSH_INTERVAL:
+                yield _sse_chunk_frame("".join(pending))
+                pending.clear()
+                pending_size = 0
+                last_flush = now
+        
+        if pending:
+            yield _sse_chunk_frame("".join(pending))
         
-        yield "data: " + json.dumps({"chunk": "", "finished": True, "full_text": full_text}) + "\n\n"
+        # 客户端已自行拼接全部片段，结束帧不再回传完整文本
+        yield _SSE_DONE_FRAME
     
     return StreamingResponse(
         generate(),
@@ -157,14 +377,30 @@ async def chat_stream(request: ChatRequest):
     )
 
 
-@router.get("/status")
-async def check_ai_status():
-    """
-    检查AI服务状态
-    """
+def _build_status_response() -> ResponseModel:
+    """AI服务状态只依赖配置，启动时构建一次"""
     is_available = bool(settings.KIMI_API_KEY)
     return ResponseModel(data={
         "available": is_available,
         "model": settings.KIMI_MODEL if is_available else None,
         "message": "AI服务已配置" if is_available else "请在.env中配置KIMI_API_KEY"
     })
+
+
+_STATUS_RESPONSE = _build_status_response()
+_STATUS_JSON = orjson.dumps(_STATUS_RESPONSE.model_dump())
+_STATUS_HEADERS = {
+    "Cache-Control": "public, max-age=30",
+    "ETag": f'"{hashlib.md5(_STATUS_JSON).hexdigest()}"'
+}
+
+
+@router.get("/status")
+async def check_ai_status(request: Request):
+    """
+    检查AI服务状态
+    响应带 ETag / Cache-Control，客户端重复轮询时可直接返回304
+    """
+    if request.headers.get("if-none-match") == _STATUS_HEADERS["ETag"]:
+        return Response(status_code=304, headers=_STATUS_HEADERS)
+    return Response(content=_STATUS_JSON, media_type="application/json", headers=_STATUS_HEADERS)
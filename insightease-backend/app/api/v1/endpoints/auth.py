@@ -2,13 +2,16 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, or_
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime, timedelta
+from collections import OrderedDict
+import time
 import uuid
 
 from app.core.database import get_db
 from app.core.security import (
-    verify_password, get_password_hash, create_access_token,
+    averify_password, aget_password_hash, create_access_token,
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
 from app.models import User
@@ -23,13 +26,68 @@ router = APIRouter()
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
+# 已认证用户缓存（用户ID -> (已从会话分离的 User, 缓存时间)），
+# 同一用户短时间内的请求不必每次查询数据库；用户信息变更时主动失效
+_USER_CACHE_SIZE = 5000
+_USER_CACHE_TTL = 60  # 秒
+_USER_CACHE: "OrderedDict[str, tuple]" = OrderedDict()
+
+
+def invalidate_cached_user(user_id: str):
+    """使缓存的用户信息失效（用户信息修改后调用）"""
+    _USER_CACHE.pop(user_id, None)
+
+
+# 用户名/邮箱可用性检查结果缓存（(字段, 值) -> (是否可用, 缓存时间)），
+# 注册表单反复检查同一个值时不必每次查询数据库；本进程内注册或修改邮箱时主动失效，
+# 其他进程的变更最多 TTL 秒后可见，注册接口仍由唯一约束保证不会重复
+_AVAILABILITY_CACHE_SIZE = 10000
+_AVAILABILITY_CACHE_TTL = 10  # 秒
+_AVAILABILITY_CACHE: "OrderedDict[tuple, tuple]" = OrderedDict()
+
+
+async def _is_available(db: AsyncSession, field: str, value: str) -> bool:
+    """检查用户名或邮箱是否未被占用（field 为 "username" 或 "email"）"""
+    key = (field, value)
+    cached = _AVAILABILITY_CACHE.get(key)
+    if cached is not None and time.time() - cached[1] < _AVAILABILITY_CACHE_TTL:
+        _AVAILABILITY_CACHE.move_to_end(key)
+        return cached[0]
+    
+    # 只判断是否存在，不加载用户对象
+    result = await db.execute(select(1).where(getattr(User, field) == value).limit(1))
+    available = result.scalar() is None
+    
+    _AVAILABILITY_CACHE[key] = (available, time.time())
+    _AVAILABILITY_CACHE.move_to_end(key)
+    if len(_AVAILABILITY_CACHE) > _AVAILABILITY_CACHE_SIZE:
+        _AVAILABILITY_CACHE.popitem(last=False)
+    return available
+
+
+def _invalidate_availability(field: str, *values: str):
+    """使缓存的可用性检查结果失效（注册或修改邮箱后调用）"""
+    for value in values:
+        _AVAILABILITY_CACHE.pop((field, value), None)
+
+
+async def _get_user_for_update(db: AsyncSession, user_id: str) -> User:
+    """
+    在当前会话中重新加载用户用于修改
+    get_current_user 返回的是缓存中已分离的对象，修改它不会写入数据库
+    """
+    user = await db.get(User, user_id)
+    if user is None:
+        raise HTTPException(status_code=404, detail="用户不存在")
+    return user
+
 
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: AsyncSession = Depends(get_db)
 ) -> User:
     """获取当前用户（依赖注入）"""
-    from app.core.security import decode_access_token
+    from app.core.security import decode_access_token_cached
     
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -37,7 +95,7 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    payload = decode_access_token(token)
+    payload = decode_access_token_cached(token)
     if payload is None:
         raise credentials_exception
     
@@ -45,11 +103,23 @@ async def get_current_user(
     if user_id is None:
         raise credentials_exception
     
-    result = await db.execute(select(User).where(User.id == user_id))
-    user = result.scalar_one_or_none()
-    
-    if user is None:
-        raise credentials_exception
+    cached = _USER_CACHE.get(user_id)
+    if cached is not None and time.time() - cached[1] < _USER_CACHE_TTL:
+        _USER_CACHE.move_to_end(user_id)
+        user = cached[0]
+    else:
+        result = await db.execute(select(User).where(User.id == user_id))
+        user = result.scalar_one_or_none()
+        
+        if user is None:
+            _USER_CACHE.pop(user_id, None)
+            raise credentials_exception
+        
+        # 从会话分离后缓存，供后续请求直接使用（列属性已全部加载）
+        db.expunge(user)
+        _USER_CACHE[user_id] = (user, time.time())
+        if len(_USER_CACHE) > _USER_CACHE_SIZE:
+            _USER_CACHE.popitem(last=False)
     
     if not user.is_active:
         raise HTTPException(status_code=400, detail="用户已被禁用")
@@ -71,18 +141,16 @@ async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
     """
     用户注册
     """
-    # 检查用户名是否已存在
+    # 用户名和邮箱是否已被占用一次查询（可能分别命中两个用户），用户名冲突优先提示
     result = await db.execute(
-        select(User).where(User.username == user_data.username)
+        select(User.username, User.email).where(
+            or_(User.username == user_data.username, User.email == user_data.email)
+        )
     )
-    if result.scalar_one_or_none():
+    conflicts = result.all()
+    if any(row.username == user_data.username for row in conflicts):
         raise HTTPException(status_code=400, detail="用户名已存在")
-    
-    # 检查邮箱是否已存在
-    result = await db.execute(
-        select(User).where(User.email == user_data.email)
-    )
-    if result.scalar_one_or_none():
+    if conflicts:
         raise HTTPException(status_code=400, detail="邮箱已被注册")
     
     # 创建用户
@@ -90,15 +158,22 @@ async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
         id=str(uuid.uuid4()),
         username=user_data.username,
         email=user_data.email,
-        hashed_password=get_password_hash(user_data.password),
+        hashed_password=await aget_password_hash(user_data.password),
         nickname=user_data.nickname,
         is_active=True,
         is_superuser=False
     )
     
     db.add(user)
-    await db.commit()
+    try:
+        await db.commit()
+    except IntegrityError:
+        # 并发注册时检查与插入之间被抢先占用，由唯一约束兜底
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="用户名或邮箱已被注册")
     await db.refresh(user)
+    _invalidate_availability("username", user.username)
+    _invalidate_availability("email", user.email)
     
     return ResponseModel(message="注册成功", data=user)
 
@@ -122,7 +197,7 @@ async def login(
     )
     user = result.scalar_one_or_none()
     
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await averify_password(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="用户名或密码错误",
@@ -135,6 +210,7 @@ async def login(
     # 更新最后登录时间
     user.last_login = datetime.now()
     await db.commit()
+    invalidate_cached_user(user.id)
     
     # 创建访问令牌
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -162,7 +238,7 @@ async def login_json(login_data: UserLogin, db: AsyncSession = Depends(get_db)):
     )
     user = result.scalar_one_or_none()
     
-    if not user or not verify_password(login_data.password, user.hashed_password):
+    if not user or not await averify_password(login_data.password, user.hashed_password):
         raise HTTPException(status_code=401, detail="用户名或密码错误")
     
     if not user.is_active:
@@ -171,6 +247,7 @@ async def login_json(login_data: UserLogin, db: AsyncSession = Depends(get_db)):
     # 更新最后登录时间
     user.last_login = datetime.now()
     await db.commit()
+    invalidate_cached_user(user.id)
     
     # 创建访问令牌
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -205,24 +282,27 @@ async def update_me(
     # 检查邮箱是否被其他用户使用
     if update_data.email and update_data.email != current_user.email:
         result = await db.execute(
-            select(User).where(User.email == update_data.email, User.id != current_user.id)
+            select(1).where(User.email == update_data.email, User.id != current_user.id).limit(1)
         )
-        if result.scalar_one_or_none():
+        if result.scalar() is not None:
             raise HTTPException(status_code=400, detail="邮箱已被其他用户使用")
     
     # 更新字段
+    user = await _get_user_for_update(db, current_user.id)
     if update_data.nickname is not None:
-        current_user.nickname = update_data.nickname
+        user.nickname = update_data.nickname
     if update_data.email is not None:
-        current_user.email = update_data.email
+        user.email = update_data.email
     if update_data.avatar is not None:
-        current_user.avatar = update_data.avatar
+        user.avatar = update_data.avatar
     
-    current_user.updated_at = datetime.now()
+    user.updated_at = datetime.now()
     await db.commit()
-    await db.refresh(current_user)
+    await db.refresh(user)
+    invalidate_cached_user(user.id)
+    _invalidate_availability("email", current_user.email, user.email)
     
-    return ResponseModel(message="更新成功", data=current_user)
+    return ResponseModel(message="更新成功", data=user)
 
 
 @router.post("/me/password")
@@ -235,13 +315,15 @@ async def change_password(
     修改当前用户密码
     """
     # 验证旧密码
-    if not verify_password(password_data.old_password, current_user.hashed_password):
+    if not await averify_password(password_data.old_password, current_user.hashed_password):
         raise HTTPException(status_code=400, detail="旧密码错误")
     
     # 更新密码
-    current_user.hashed_password = get_password_hash(password_data.new_password)
-    current_user.updated_at = datetime.now()
+    user = await _get_user_for_update(db, current_user.id)
+    user.hashed_password = await aget_password_hash(password_data.new_password)
+    user.updated_at = datetime.now()
     await db.commit()
+    invalidate_cached_user(user.id)
     
     return ResponseModel(message="密码修改成功")
 
@@ -251,10 +333,8 @@ async def check_username(username: str, db: AsyncSession = Depends(get_db)):
     """
     检查用户名是否可用
     """
-    result = await db.execute(select(User).where(User.username == username))
-    user = result.scalar_one_or_none()
     return ResponseModel(data={
-        "available": user is None,
+        "available": await _is_available(db, "username", username),
         "username": username
     })
 
@@ -264,9 +344,7 @@ async def check_email(email: str, db: AsyncSession = Depends(get_db)):
     """
     检查邮箱是否可用
     """
-    result = await db.execute(select(User).where(User.email == email))
-    user = result.scalar_one_or_none()
     return ResponseModel(data={
-        "available": user is None,
+        "available": await _is_available(db, "email", email),
         "email": email
     })
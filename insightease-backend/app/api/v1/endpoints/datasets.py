@@ -1,16 +1,22 @@
 from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Query
+from fastapi.responses import FileResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, desc, func
 import pandas as pd
+import numpy as np
+import asyncio
 import uuid
-import shutil
 import os
+import threading
+from collections import OrderedDict
 from pathlib import Path
+from functools import lru_cache
 from datetime import datetime
 
 from app.core.database import get_db
 from app.core.config import settings
 from app.core.storage import storage, AliyunOSSStorage
+from app.core.executor import run_in_parse_pool
 from app.models import Dataset, User
 from app.schemas.base import ResponseModel, PaginationModel
 from app.schemas.dataset import (
@@ -18,17 +24,19 @@ from app.schemas.dataset import (
     DatasetStatistics, DatasetSummary, ColumnStats
 )
 from app.api.v1.endpoints.auth import get_current_active_user
+from app.services.ai_service import ai_service
 
 router = APIRouter()
 
 
-def calculate_quality_score(df: pd.DataFrame) -> int:
+def calculate_quality_score(df: pd.DataFrame, numeric_cols=None) -> int:
     """
     计算数据集质量评分
     基于以下维度：
     - 完整性（40分）：缺失值比例
     - 一致性（30分）：重复值比例
     - 有效性（30分）：异常值比例
+    numeric_cols: 调用方已知的数值列，传入时不再用 select_dtypes 扫描列类型
     """
     total_rows = len(df)
     if total_rows == 0:
@@ -37,8 +45,9 @@ def calculate_quality_score(df: pd.DataFrame) -> int:
     score = 0
     
     # 1. 完整性评分（40分）- 基于缺失值
-    null_count = df.isnull().sum().sum()
+    # 缺失值数 = 单元格总数 - 非空计数，逐列直接计数，不生成整表的布尔矩阵
     total_cells = total_rows * len(df.columns)
+    null_count = int(total_cells - df.count().sum())
     if total_cells > 0:
         completeness = 1 - (null_count / total_cells)
         score += int(completeness * 40)
@@ -46,7 +55,12 @@ def calculate_quality_score(df: pd.DataFrame) -> int:
         score += 40
     
     # 2. 一致性评分（30分）- 基于重复值
-    unique_rows = len(df.drop_duplicates())
+    # 每行算一个 64 位哈希后统计不同哈希值个数，比 duplicated() 逐列因子化再组合少一遍整表处理
+    if len(df.columns) > 0:
+        row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+        unique_rows = len(pd.unique(row_hashes))
+    else:
+        unique_rows = total_rows
     if total_rows > 0:
         consistency = unique_rows / total_rows
         score += int(consistency * 30)
@@ -54,19 +68,19 @@ def calculate_quality_score(df: pd.DataFrame) -> int:
         score += 30
     
     # 3. 有效性评分（30分）- 基于数值型列的异常值
-    numeric_cols = df.select_dtypes(include=['number']).columns
+    if numeric_cols is None:
+        numeric_cols = df.select_dtypes(include=['number']).columns
     if len(numeric_cols) > 0:
-        outlier_ratios = []
-        for col in numeric_cols:
-            Q1 = df[col].quantile(0.25)
-            Q3 = df[col].quantile(0.75)
-            IQR = Q3 - Q1
-            lower_bound = Q1 - 1.5 * IQR
-            upper_bound = Q3 + 1.5 * IQR
-            outliers = df[(df[col] < lower_bound) | (df[col] > upper_bound)].shape[0]
-            outlier_ratios.append(outliers / total_rows)
+        # 所有数值列的四分位数一次算出，再对整个数值块按列统计越界个数
+        numeric_df = df[numeric_cols]
+        q = numeric_df.quantile([0.25, 0.75]).to_numpy()
+        IQR = q[1] - q[0]
+        lower_bound = q[0] - 1.5 * IQR
+        upper_bound = q[1] + 1.5 * IQR
+        arr = numeric_df.to_numpy(dtype=np.float64, na_value=np.nan)
+        outliers = ((arr < lower_bound) | (arr > upper_bound)).sum(axis=0)
         
-        avg_outlier_ratio = sum(outlier_ratios) / len(outlier_ratios)
+        avg_outlier_ratio = float(outliers.mean()) / total_rows
         validity = 1 - min(avg_outlier_ratio * 2, 1.0)  # 异常值比例翻倍惩罚
         score += int(validity * 30)
     else:
@@ -77,7 +91,20 @@ def calculate_quality_score(df: pd.DataFrame) -> int:
 def _has_header(filepath: str) -> bool:
     """
     检测 CSV 文件是否有表头
-    通过检查第一行是否为全数字/日期等数据类型来判断
+    检测结果按 (路径, 修改时间, 大小) 缓存，同一文件被多次读取时只检测一次
+    """
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return True  # 出错时默认有表头
+    return _detect_header(filepath, stat.st_mtime, stat.st_size)
+
+
+@lru_cache(maxsize=64)
+def _detect_header(filepath: str, mtime: float, size: int) -> bool:
+    """
+    通过检查第一行是否为全数字/日期等数据类型来判断是否有表头
+    （结果由 lru_cache 缓存，mtime/size 仅用于在文件变化时使缓存失效）
     """
     try:
         # 读取前两行，不指定表头
@@ -115,14 +142,15 @@ def _has_header(filepath: str) -> bool:
         return True  # 出错时默认有表头
 
 
-def read_csv_with_auto_header(filepath: str, nrows: int = None, **kwargs) -> pd.DataFrame:
+def read_csv_with_auto_header(filepath: str, nrows: int = None, has_header: bool = None,
+                              **kwargs) -> pd.DataFrame:
     """
     智能读取 CSV 文件，自动检测是否有表头
     如果没有表头，自动生成 col_0, col_1, ... 的列名
+    has_header: 调用方已检测过表头时直接传入
     """
-    # 如果没有指定 nrows 或 nrows 较大，需要检测表头
-    # 如果 nrows 较小（<=2），可能已经在上传时处理过了
-    has_header = _has_header(filepath)
+    if has_header is None:
+        has_header = _has_header(filepath)
     
     if has_header:
         # 有表头，正常读取
@@ -134,6 +162,276 @@ def read_csv_with_auto_header(filepath: str, nrows: int = None, **kwargs) -> pd.
         return df
 
 
+def _read_excel_fast(filepath: str, nrows: int = None) -> pd.DataFrame:
+    """
+    读取 Excel 文件，结果与 pd.read_excel 一致
+    .xlsx 用 openpyxl 只读模式按值逐行读取，不为每个单元格构造对象，
+    再交给 pd.read_excel 内部使用的 TextParser 做类型推断和缺失值识别；
+    旧版 .xls 不受 openpyxl 支持，仍由 pandas 读取
+    """
+    if Path(filepath).suffix.lower() != ".xlsx":
+        return pd.read_excel(filepath, nrows=nrows)
+    
+    from contextlib import closing
+    
+    data = []
+    last_row_with_data = -1
+    with closing(_iter_xlsx_rows(filepath)) as rows:
+        for row_number, row in enumerate(rows):
+            if row:
+                last_row_with_data = row_number
+            data.append(row)
+            # 表头 1 行 + nrows 行数据读够即停止
+            if nrows is not None and len(data) >= nrows + 1:
+                break
+    
+    # 与 pandas 一样去掉末尾的空行
+    return _xlsx_rows_to_frame(data[:last_row_with_data + 1], nrows=nrows)
+
+
+def _iter_xlsx_rows(filepath: str):
+    """
+    逐行读取 .xlsx 第一个工作表的值（与 pd.read_excel 读取同一个工作表）
+    单元格取值规则与 pandas 的 openpyxl 读取器一致：
+    空单元格为 ""，错误值为 NaN，整数值的浮点数转为 int；行尾的空单元格已去掉
+    """
+    from openpyxl import load_workbook
+    from openpyxl.cell.cell import ERROR_CODES
+    
+    wb = load_workbook(filepath, read_only=True, data_only=True, keep_links=False)
+    try:
+        sheet = wb.worksheets[0]
+        # 只读模式下文件记录的表格范围可能不准确，与 pandas 一样按实际内容读取
+        sheet.reset_dimensions()
+        
+        for row in sheet.iter_rows(values_only=True):
+            converted_row = []
+            for value in row:
+                if value is None:
+                    value = ""
+                elif isinstance(value, float):
+                    if value.is_integer():
+                        value = int(value)
+                elif isinstance(value, str) and value in ERROR_CODES:
+                    value = np.nan
+                converted_row.append(value)
+            while converted_row and converted_row[-1] == "":
+                converted_row.pop()
+            yield converted_row
+    finally:
+        wb.close()
+
+
+def _xlsx_rows_to_frame(data: list, nrows: int = None) -> pd.DataFrame:
+    """把 _iter_xlsx_rows 读出的行（首行为表头）交给 TextParser 做类型推断，与 pd.read_excel 一致"""
+    from pandas.io.parsers import TextParser
+    
+    if not data:
+        return pd.DataFrame()
+    
+    # 各行补齐到相同宽度
+    max_width = max(len(row) for row in data)
+    data = [row + [""] * (max_width - len(row)) for row in data]
+    
+    parser = TextParser(data, header=0, nrows=nrows, skip_blank_lines=False)
+    return parser.read(nrows=nrows)
+
+
+def _parquet_sidecar_path(filepath: str) -> str:
+    """数据文件对应的 Parquet 缓存文件路径"""
+    return filepath + ".parquet"
+
+
+def _write_parquet_sidecar(df, sidecar: str):
+    """
+    写入 Parquet 缓存文件（先写临时文件再替换，避免读到不完整的文件）
+    df 可以是 DataFrame，也可以是已转换好的 pyarrow Table
+    """
+    tmp_path = f"{sidecar}.{uuid.uuid4().hex}.tmp"
+    try:
+        if isinstance(df, pd.DataFrame):
+            df.to_parquet(tmp_path, engine="pyarrow", compression="zstd", index=False)
+        else:
+            import pyarrow.parquet as pq
+            pq.write_table(df, tmp_path, compression="zstd")
+        os.replace(tmp_path, sidecar)
+    except Exception:
+        # 混合类型等无法写为 Parquet 的数据，下次仍从原文件解析
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _read_parquet_sidecar_head(filepath: str, nrows: int):
+    """
+    从 Parquet 缓存只读取前 nrows 行（按批读取，不加载整个文件）
+    缓存不存在、已过期或读取失败时返回 None，由调用方解析原文件
+    """
+    sidecar = _parquet_sidecar_path(filepath)
+    try:
+        if os.path.getmtime(sidecar) < os.path.getmtime(filepath):
+            return None
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        parquet_file = pq.ParquetFile(sidecar)
+        batch = next(parquet_file.iter_batches(batch_size=max(nrows, 1)), None)
+        if batch is None:
+            table = parquet_file.schema_arrow.empty_table()
+        else:
+            table = pa.Table.from_batches([batch])
+        return table.to_pandas().head(nrows)
+    except Exception:
+        return None
+
+
+# 进程内缓存的已解析数据集：最多 DATASET_CACHE_SIZE 个，且总内存不超过 DATASET_CACHE_MAX_BYTES
+DATASET_CACHE_SIZE = 8
+DATASET_CACHE_MAX_BYTES = 1 << 30
+_DATASET_CACHE: "OrderedDict[tuple, tuple]" = OrderedDict()
+_dataset_cache_bytes = 0
+_dataset_cache_lock = threading.Lock()
+
+
+def read_dataset_file(filepath: str) -> pd.DataFrame:
+    """
+    读取完整的数据集文件（CSV/Excel）
+    最近读取的文件按 (路径, 修改时间, 大小) 缓存在进程内，同一数据集被多个接口
+    连续使用时只解析一次；返回副本，调用方可以随意修改
+    """
+    stat = os.stat(filepath)
+    key = (filepath, stat.st_mtime_ns, stat.st_size)
+    with _dataset_cache_lock:
+        entry = _DATASET_CACHE.get(key)
+        if entry is not None:
+            _DATASET_CACHE.move_to_end(key)
+    
+    if entry is None:
+        df = _load_dataset_file(filepath)
+        _cache_dataset(key, df)
+    else:
+        df = entry[0]
+    return df.copy()
+
+
+def _cache_dataset(key: tuple, df: pd.DataFrame):
+    """把解析结果放入缓存，按最近最少使用淘汰，直到条目数和总内存都不超过上限"""
+    global _dataset_cache_bytes
+    nbytes = int(df.memory_usage(deep=True).sum())
+    if nbytes > DATASET_CACHE_MAX_BYTES:
+        # 单个数据集超过上限时不缓存，避免把其他数据集全部挤出
+        return
+    
+    with _dataset_cache_lock:
+        if key in _DATASET_CACHE:
+            return
+        _DATASET_CACHE[key] = (df, nbytes)
+        _dataset_cache_bytes += nbytes
+        while len(_DATASET_CACHE) > DATASET_CACHE_SIZE or _dataset_cache_bytes > DATASET_CACHE_MAX_BYTES:
+            _, (_, evicted_bytes) = _DATASET_CACHE.popitem(last=False)
+            _dataset_cache_bytes -= evicted_bytes
+
+
+def _load_dataset_file(filepath: str) -> pd.DataFrame:
+    """
+    解析数据集文件（结果放入进程内缓存，不可直接修改）
+    首次解析后在原文件旁写入 Parquet 缓存，原文件未修改时直接读取缓存，
+    列式、带类型，比重新解析 CSV/Excel 快得多
+    """
+    sidecar = _parquet_sidecar_path(filepath)
+    try:
+        if os.path.getmtime(sidecar) >= os.path.getmtime(filepath):
+            return pd.read_parquet(sidecar, engine="pyarrow")
+    except OSError:
+        # 缓存不存在
+        pass
+    except Exception:
+        # 缓存损坏，重新解析
+        pass
+    
+    if filepath.endswith(".csv"):
+        df = read_csv_with_auto_header(filepath)
+    else:
+        df = _read_excel_fast(filepath)
+    
+    # 后台写入缓存，不阻塞本次读取；传入副本，避免调用方修改数据
+    from app.core.executor import parse_pool
+    parse_pool.submit(_write_parquet_sidecar, df.copy(), sidecar)
+    return df
+
+
+# OSS 上的 CSV 预览时按字节范围下载的开头部分大小
+PREVIEW_HEAD_BYTES = 1 << 20
+
+
+def _read_preview_bytes(content: bytes, ext: str, rows: int) -> pd.DataFrame:
+    """把文件内容写入临时文件后读取前 rows 行"""
+    import tempfile
+    with tempfile.NamedTemporaryFile(mode='wb', delete=False, suffix=ext) as tmp:
+        tmp.write(content)
+        tmp_path = tmp.name
+    
+    try:
+        if ext == ".csv":
+            return read_csv_with_auto_header(tmp_path, nrows=rows)
+        return _read_excel_fast(tmp_path, nrows=rows)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _read_csv_head_bytes(head: bytes, rows: int, truncated: bool):
+    """
+    从 CSV 开头部分读取前 rows 行
+    开头部分被截断时丢弃最后一个不完整的行；行数不足或解析失败时返回 None，由调用方回退到完整文件
+    """
+    if truncated:
+        cut = head.rfind(b"\n")
+        if cut < 0:
+            return None
+        head = head[:cut + 1]
+    
+    try:
+        df = _read_preview_bytes(head, ".csv", rows)
+    except Exception:
+        if not truncated:
+            raise
+        return None
+    
+    if truncated and len(df) < rows:
+        return None
+    return df
+
+
+# 上传文件分块写入的块大小
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+
+def _parse_uploaded_file(filepath: str, ext: str):
+    """解析上传的文件，返回 (DataFrame, schema, 质量评分)"""
+    if ext == ".csv":
+        # 智能读取 CSV，自动检测表头
+        df = read_csv_with_auto_header(filepath, low_memory=False)
+    else:
+        df = _read_excel_fast(filepath)
+    
+    schema = []
+    for col in df.columns:
+        # 确保列名是字符串（pandas 列名可能是数字等其他类型）
+        col_name = str(col)
+        schema.append({
+            "name": col_name,
+            "dtype": str(df[col].dtype),
+            "sample_values": df[col].dropna().head(3).tolist()
+        })
+    # 示例值可能是日期、numpy 等类型，转换为可 JSON 序列化的值后再存入数据库
+    from app.api.v1.endpoints.analysis import clean_json_data
+    schema = clean_json_data(schema)
+    
+    # 计算质量评分
+    quality_score = calculate_quality_score(df)
+    return df, schema, quality_score
+
+
 @router.post("/upload", response_model=ResponseModel[DatasetResponse])
 async def upload_dataset(
     file: UploadFile = File(...),
@@ -145,47 +443,43 @@ async def upload_dataset(
         raise HTTPException(400, detail="仅支持CSV/Excel格式")
     
     dataset_id = str(uuid.uuid4())
+    storage_path = None
     
     try:
-        # 读取文件内容
-        file_content = await file.read()
-        file_size = len(file_content)
-        
-        # 使用存储服务保存文件（OSS 或本地）
-        storage_path = await storage.save(dataset_id, file.filename, file_content)
-        
-        # 解析文件内容（需要先保存到临时文件）
+        # 分块写入临时文件，不把整个上传文件读入内存，也不阻塞事件循环
         import tempfile
-        with tempfile.NamedTemporaryFile(mode='wb', delete=False, suffix=ext) as tmp:
-            tmp.write(file_content)
-            tmp_path = tmp.name
+        import aiofiles
+        fd, tmp_path = tempfile.mkstemp(suffix=ext)
+        os.close(fd)
         
         try:
-            if ext == ".csv":
-                # 智能读取 CSV，自动检测表头
-                df = read_csv_with_auto_header(tmp_path, low_memory=False)
-                row_count = len(df)
-            else:
-                df = pd.read_excel(tmp_path)
-                row_count = len(df)
+            file_size = 0
+            async with aiofiles.open(tmp_path, "wb") as out:
+                while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                    file_size += len(chunk)
+                    await out.write(chunk)
             
-            schema = []
-            for col in df.columns:
-                # 确保列名是字符串（pandas 列名可能是数字等其他类型）
-                col_name = str(col)
-                schema.append({
-                    "name": col_name,
-                    "dtype": str(df[col].dtype),
-                    "sample_values": df[col].dropna().head(3).tolist()
-                })
+            # 解析文件、生成 schema 和质量评分在解析线程池中执行
+            df, schema, quality_score = await run_in_parse_pool(_parse_uploaded_file, tmp_path, ext)
+            row_count = len(df)
             
-            # 计算质量评分
-            quality_score = calculate_quality_score(df)
+            # 预先生成AI摘要，AI接口直接读取，无需重新解析文件
+            ai_digest = await ai_service.build_digest_async(df)
+            
+            # 使用存储服务保存文件（OSS 或本地；本地存储直接移动临时文件）
+            storage_path = await storage.save_file(dataset_id, file.filename, tmp_path)
         finally:
             # 清理临时文件
             if os.path.exists(tmp_path):
                 os.remove(tmp_path)
         
+        # 本地存储时由已解析的数据后台写入 Parquet 缓存和统计信息缓存，
+        # 预览、分析首次读取即可使用，统计接口无需再读取文件
+        if not storage_path.startswith("oss://"):
+            from app.core.executor import parse_pool
+            parse_pool.submit(_write_parquet_sidecar, df, _parquet_sidecar_path(storage_path))
+            parse_pool.submit(_write_dataset_statistics, df, storage_path)
+        
         db_dataset = Dataset(
             id=dataset_id,
             user_id=current_user.id,
@@ -196,6 +490,7 @@ async def upload_dataset(
             col_count=len(df.columns),
             schema=schema,
             quality_score=quality_score,
+            ai_digest=ai_digest,
             status="ready"
         )
         
@@ -207,10 +502,11 @@ async def upload_dataset(
         
     except Exception as e:
         # 如果数据库保存失败，尝试删除已上传的文件
-        try:
-            await storage.delete(storage_path)
-        except:
-            pass
+        if storage_path:
+            try:
+                await storage.delete(storage_path)
+            except:
+                pass
         raise HTTPException(500, detail=f"处理失败: {str(e)}")
 
 def _normalize_dataset_schema(dataset):
@@ -225,6 +521,22 @@ def _normalize_dataset_schema(dataset):
     return dataset
 
 
+# 列表类接口只查询 DatasetResponse 需要的列，ai_digest 等大字段不读取
+_DATASET_LIST_COLUMNS = (
+    Dataset.id, Dataset.filename, Dataset.row_count, Dataset.col_count, Dataset.file_size,
+    Dataset.schema, Dataset.quality_score, Dataset.ai_summary, Dataset.status, Dataset.created_at
+)
+
+
+def _dataset_list_item(row) -> dict:
+    """将列表查询返回的行转换为字典（不构造 ORM 对象），schema 中的列名规范化为字符串"""
+    item = {column.key: row._mapping[column.key] for column in _DATASET_LIST_COLUMNS}
+    for field in item["schema"] or []:
+        if 'name' in field and not isinstance(field['name'], str):
+            field['name'] = str(field['name'])
+    return item
+
+
 @router.get("", response_model=ResponseModel[PaginationModel[DatasetResponse]])
 async def list_datasets(
     page: int = Query(1, ge=1),
@@ -232,24 +544,29 @@ async def list_datasets(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    count_result = await db.execute(
-        select(func.count(Dataset.id))
-        .where(Dataset.is_deleted == False, Dataset.user_id == current_user.id)
-    )
-    total = count_result.scalar()
+    conditions = (Dataset.is_deleted == False, Dataset.user_id == current_user.id)
     
+    # 分页数据和总数一次查询取回：窗口函数 COUNT(*) OVER () 在 LIMIT 之前计算，即满足条件的总行数
     result = await db.execute(
-        select(Dataset)
-        .where(Dataset.is_deleted == False, Dataset.user_id == current_user.id)
+        select(*_DATASET_LIST_COLUMNS, func.count().over().label("total"))
+        .where(*conditions)
         .order_by(desc(Dataset.created_at))
         .offset((page - 1) * page_size)
         .limit(page_size)
     )
+    rows = result.all()
+    
+    if rows:
+        total = rows[0].total
+    elif page > 1:
+        # 页码超出范围时本页没有行可带回总数，单独查询
+        count_result = await db.execute(select(func.count(Dataset.id)).where(*conditions))
+        total = count_result.scalar()
+    else:
+        total = 0
     
     # 规范化 schema 中的列名
-    datasets = result.scalars().all()
-    for dataset in datasets:
-        _normalize_dataset_schema(dataset)
+    datasets = [_dataset_list_item(row) for row in rows]
     
     return ResponseModel(data={
         "total": total,
@@ -303,22 +620,15 @@ async def preview_dataset(
         
         # 处理 OSS 存储的文件
         if storage_path.startswith("oss://"):
-            # 下载到临时文件
-            file_content = await storage.read(storage_path)
-            import tempfile
             ext = Path(dataset.filename).suffix.lower()
-            with tempfile.NamedTemporaryFile(mode='wb', delete=False, suffix=ext) as tmp:
-                tmp.write(file_content)
-                tmp_path = tmp.name
-            
-            try:
-                if ext == ".csv":
-                    df = read_csv_with_auto_header(tmp_path, nrows=rows)
-                else:
-                    df = pd.read_excel(tmp_path, nrows=rows)
-            finally:
-                if os.path.exists(tmp_path):
-                    os.remove(tmp_path)
+            df = None
+            if ext == ".csv":
+                # CSV 只按字节范围下载开头部分，预览耗时与文件大小无关
+                head = await storage.read_head(storage_path, PREVIEW_HEAD_BYTES)
+                df = _read_csv_head_bytes(head, rows, truncated=len(head) >= PREVIEW_HEAD_BYTES)
+            if df is None:
+                # Excel 或开头部分不足预览行数时下载完整文件
+                df = _read_preview_bytes(await storage.read(storage_path), ext, rows)
         else:
             # 本地文件直接读取
             ext = Path(storage_path).suffix.lower()
@@ -326,18 +636,21 @@ async def preview_dataset(
                 backend_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))))
                 storage_path = os.path.join(backend_root, storage_path.lstrip('./').replace('/', os.sep))
             
-            if ext == ".csv":
-                df = read_csv_with_auto_header(storage_path, nrows=rows)
-            else:
-                df = pd.read_excel(storage_path, nrows=rows)
+            # 优先读取 Parquet 缓存，无缓存的旧数据集再解析原文件
+            df = _read_parquet_sidecar_head(storage_path, rows)
+            if df is None:
+                if ext == ".csv":
+                    df = read_csv_with_auto_header(storage_path, nrows=rows)
+                else:
+                    df = _read_excel_fast(storage_path, nrows=rows)
         
-        # 转换数据，确保所有键都是字符串
-        raw_data = df.where(pd.notnull(df), None).to_dict(orient="records")
-        # 将字典键转换为字符串
-        data = [{str(k): v for k, v in row.items()} for row in raw_data]
+        # 列名统一转为字符串，to_dict 直接生成字符串键的记录，无需再逐个单元格转换
+        df.columns = df.columns.map(str)
+        # 先转为 object，日期列中的 NaT 也能替换为 None（Parquet 缓存和 Excel 中的日期列为 datetime 类型）
+        data = df.astype(object).where(df.notna(), None).to_dict(orient="records")
         
         return ResponseModel(data={
-            "columns": [str(col) for col in df.columns],
+            "columns": df.columns.tolist(),
             "data": data,
             "total_rows": dataset.row_count
         })
@@ -364,6 +677,11 @@ async def delete_dataset(
     dataset.is_deleted = True
     dataset.updated_at = datetime.now()
     await db.commit()
+    
+    # 清理 AI 接口的数据采样缓存
+    from app.api.v1.endpoints.ai import clear_dataset_cache
+    clear_dataset_cache()
+    
     return ResponseModel(message="删除成功")
 
 
@@ -396,6 +714,133 @@ async def update_dataset(
     return ResponseModel(message="更新成功", data=dataset)
 
 
+def _statistics_sidecar_path(filepath: str) -> str:
+    """数据文件对应的统计信息缓存文件路径"""
+    return filepath + ".stats.json"
+
+
+def _write_statistics_sidecar(stats: dict, sidecar: str):
+    """写入统计信息缓存文件（先写临时文件再替换，避免读到不完整的文件）"""
+    import json
+    tmp_path = f"{sidecar}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(stats, f, ensure_ascii=False)
+        os.replace(tmp_path, sidecar)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _write_dataset_statistics(df: pd.DataFrame, filepath: str):
+    """由已解析的数据计算统计信息并写入缓存（上传时在后台执行）"""
+    _write_statistics_sidecar(_build_dataset_statistics(df), _statistics_sidecar_path(filepath))
+
+
+def _compute_dataset_statistics(filepath: str) -> dict:
+    """
+    获取数据集详细统计信息
+    优先读取上传时写入的统计缓存；缓存不存在或已过期时读取文件重新计算并写回缓存
+    """
+    import json
+    sidecar = _statistics_sidecar_path(filepath)
+    try:
+        if os.path.getmtime(sidecar) >= os.path.getmtime(filepath):
+            with open(sidecar, encoding="utf-8") as f:
+                return json.load(f)
+    except OSError:
+        # 缓存不存在
+        pass
+    except ValueError:
+        # 缓存损坏，重新计算
+        pass
+    
+    stats = _build_dataset_statistics(read_dataset_file(filepath))
+    _write_statistics_sidecar(stats, sidecar)
+    return stats
+
+
+def _build_dataset_statistics(df: pd.DataFrame) -> dict:
+    """
+    计算数据集详细统计信息
+    缺失值、唯一值数和数值列的均值/中位数/标准差/极值都按整表一次计算，不逐列调用
+    """
+    total_rows = len(df)
+    
+    # 计算内存使用
+    memory_usage = f"{df.memory_usage(deep=True).sum() / 1024 / 1024:.2f} MB"
+    
+    non_null_counts = df.count()
+    numeric_cols = [col for col, dtype in df.dtypes.items() if pd.api.types.is_numeric_dtype(dtype)]
+    numeric_set = set(numeric_cols)
+    other_cols = [col for col in df.columns if col not in numeric_set]
+    
+    # 统一转为 float64 再按列归约：混合 Int64/布尔等类型时结果不会变成含 NA 的 object
+    # describe 一次得到均值/标准差/极值/中位数，比分别调用 mean/median/std/min/max 少扫描几遍数据
+    if total_rows > 0 and numeric_cols:
+        numeric_stats = df[numeric_cols].astype("float64").describe(percentiles=[.5]).T
+        numeric_stats = numeric_stats.rename(columns={"50%": "median"})
+    else:
+        numeric_stats = None
+    unique_counts = df[other_cols].nunique()
+    
+    # 统计各列信息
+    column_stats = []
+    numeric_columns = []
+    categorical_columns = []
+    datetime_columns = []
+    missing_values_total = 0
+    
+    for col, dtype in df.dtypes.items():
+        non_null_count = int(non_null_counts[col])
+        null_count = total_rows - non_null_count
+        missing_values_total += null_count
+        
+        col_stat = {
+            "name": str(col),
+            "dtype": str(dtype),
+            "non_null_count": non_null_count,
+            "null_count": null_count,
+            "null_percentage": round(null_count / total_rows * 100, 2)
+        }
+        
+        # 判断列类型
+        if pd.api.types.is_numeric_dtype(dtype):
+            col_stat["type"] = "numeric"
+            for stat in ("mean", "median", "std", "min", "max"):
+                col_stat[stat] = round(float(numeric_stats.at[col, stat]), 4) if numeric_stats is not None else None
+            numeric_columns.append(str(col))
+            
+        elif pd.api.types.is_datetime64_any_dtype(dtype):
+            col_stat["type"] = "datetime"
+            col_stat["unique_count"] = int(unique_counts[col])
+            datetime_columns.append(str(col))
+            
+        else:
+            col_stat["type"] = "categorical"
+            col_stat["unique_count"] = int(unique_counts[col])
+            mode = df[col].mode()
+            col_stat["most_common"] = str(mode.iloc[0]) if not mode.empty else None
+            categorical_columns.append(str(col))
+        
+        column_stats.append(col_stat)
+    
+    total_cells = total_rows * len(df.columns)
+    missing_percentage = round(missing_values_total / total_cells * 100, 2) if total_cells > 0 else 0
+    
+    return {
+        "total_rows": total_rows,
+        "total_columns": len(df.columns),
+        "memory_usage": memory_usage,
+        "column_stats": column_stats,
+        "numeric_columns": numeric_columns,
+        "categorical_columns": categorical_columns,
+        "datetime_columns": datetime_columns,
+        "missing_values_total": missing_values_total,
+        "missing_values_percentage": missing_percentage
+    }
+
+
 @router.get("/{dataset_id}/statistics", response_model=ResponseModel[DatasetStatistics])
 async def get_dataset_statistics(
     dataset_id: str, 
@@ -415,78 +860,26 @@ async def get_dataset_statistics(
         raise HTTPException(404, detail="数据集不存在")
     
     try:
-        # 读取数据文件
-        ext = Path(dataset.storage_path).suffix.lower()
-        if ext == ".csv":
-            df = read_csv_with_auto_header(dataset.storage_path)
-        else:
-            df = pd.read_excel(dataset.storage_path)
-        
-        # 计算内存使用
-        memory_usage = f"{df.memory_usage(deep=True).sum() / 1024 / 1024:.2f} MB"
-        
-        # 统计各列信息
-        column_stats = []
-        numeric_columns = []
-        categorical_columns = []
-        datetime_columns = []
-        missing_values_total = 0
-        
-        for col in df.columns:
-            col_data = df[col]
-            null_count = int(col_data.isna().sum())
-            missing_values_total += null_count
-            
-            col_stat = {
-                "name": str(col),
-                "dtype": str(col_data.dtype),
-                "non_null_count": int(col_data.notna().sum()),
-                "null_count": null_count,
-                "null_percentage": round(null_count / len(df) * 100, 2)
-            }
-            
-            # 判断列类型
-            if pd.api.types.is_numeric_dtype(col_data):
-                col_stat["type"] = "numeric"
-                col_stat["mean"] = round(float(col_data.mean()), 4) if not col_data.empty else None
-                col_stat["median"] = round(float(col_data.median()), 4) if not col_data.empty else None
-                col_stat["std"] = round(float(col_data.std()), 4) if not col_data.empty else None
-                col_stat["min"] = round(float(col_data.min()), 4) if not col_data.empty else None
-                col_stat["max"] = round(float(col_data.max()), 4) if not col_data.empty else None
-                numeric_columns.append(str(col))
-                
-            elif pd.api.types.is_datetime64_any_dtype(col_data):
-                col_stat["type"] = "datetime"
-                col_stat["unique_count"] = int(col_data.nunique())
-                datetime_columns.append(str(col))
-                
-            else:
-                col_stat["type"] = "categorical"
-                col_stat["unique_count"] = int(col_data.nunique())
-                col_stat["most_common"] = str(col_data.mode().iloc[0]) if not col_data.mode().empty else None
-                categorical_columns.append(str(col))
-            
-            column_stats.append(col_stat)
-        
-        total_cells = len(df) * len(df.columns)
-        missing_percentage = round(missing_values_total / total_cells * 100, 2) if total_cells > 0 else 0
-        
-        return ResponseModel(data={
-            "total_rows": len(df),
-            "total_columns": len(df.columns),
-            "memory_usage": memory_usage,
-            "column_stats": column_stats,
-            "numeric_columns": numeric_columns,
-            "categorical_columns": categorical_columns,
-            "datetime_columns": datetime_columns,
-            "missing_values_total": missing_values_total,
-            "missing_values_percentage": missing_percentage
-        })
+        # 读取文件和统计计算都在解析线程池中执行，不阻塞事件循环
+        stats = await run_in_parse_pool(_compute_dataset_statistics, dataset.storage_path)
+        return ResponseModel(data=stats)
         
     except Exception as e:
         raise HTTPException(500, detail=f"统计计算失败: {str(e)}")
 
 
+# 下载时每次读取和发送的块大小（Starlette 默认 64 KiB）
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+
+
+class LargeChunkFileResponse(FileResponse):
+    """
+    按 DOWNLOAD_CHUNK_SIZE 分块发送文件的 FileResponse
+    保留 Content-Length、Range 请求和 pathsend 零拷贝支持，大文件下载时读写次数少得多
+    """
+    chunk_size = DOWNLOAD_CHUNK_SIZE
+
+
 @router.get("/{dataset_id}/download")
 async def download_dataset(
     dataset_id: str, 
@@ -494,7 +887,7 @@ async def download_dataset(
     current_user: User = Depends(get_current_active_user)
 ):
     """下载数据集文件"""
-    from fastapi.responses import FileResponse, RedirectResponse
+    from fastapi.responses import RedirectResponse
     
     result = await db.execute(
         select(Dataset).where(
@@ -531,7 +924,7 @@ async def download_dataset(
     from urllib.parse import quote
     encoded_filename = quote(dataset.filename)
     
-    return FileResponse(
+    return LargeChunkFileResponse(
         path=storage_path,
         filename=dataset.filename,
         media_type="application/octet-stream",
@@ -547,41 +940,32 @@ async def get_dataset_summary(
     current_user: User = Depends(get_current_active_user)
 ):
     """获取数据集汇总信息（用于仪表盘）"""
-    # 总数统计
-    total_result = await db.execute(
-        select(func.count(Dataset.id)).where(
-            Dataset.is_deleted == False,
-            Dataset.user_id == current_user.id
-        )
-    )
-    total_datasets = total_result.scalar()
+    from app.core.database import AsyncSessionLocal
     
-    # 总行数
-    rows_result = await db.execute(
-        select(func.sum(Dataset.row_count)).where(
-            Dataset.is_deleted == False,
-            Dataset.user_id == current_user.id
-        )
-    )
-    total_rows = rows_result.scalar() or 0
+    conditions = (Dataset.is_deleted == False, Dataset.user_id == current_user.id)
     
-    # 总文件大小
-    size_result = await db.execute(
-        select(func.sum(Dataset.file_size)).where(
-            Dataset.is_deleted == False,
-            Dataset.user_id == current_user.id
-        )
-    )
-    total_files_size = size_result.scalar() or 0
+    async def fetch_recent_uploads():
+        # 同一个会话不能并发执行查询，最近上传列表用单独的会话（连接池中另一个连接）
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(*_DATASET_LIST_COLUMNS).where(*conditions)
+                .order_by(desc(Dataset.created_at))
+                .limit(5)
+            )
+            return [_dataset_list_item(row) for row in result.all()]
     
-    # 最近上传的5个数据集
-    recent_result = await db.execute(
-        select(Dataset).where(Dataset.user_id == current_user.id)
-        .where(Dataset.is_deleted == False)
-        .order_by(desc(Dataset.created_at))
-        .limit(5)
+    # 总数、总行数、总文件大小一次查询，与最近上传的5个数据集的查询并发执行
+    agg_result, recent_uploads = await asyncio.gather(
+        db.execute(
+            select(
+                func.count(Dataset.id),
+                func.coalesce(func.sum(Dataset.row_count), 0),
+                func.coalesce(func.sum(Dataset.file_size), 0)
+            ).where(*conditions)
+        ),
+        fetch_recent_uploads()
     )
-    recent_uploads = recent_result.scalars().all()
+    total_datasets, total_rows, total_files_size = agg_result.one()
     
     return ResponseModel(data={
         "total_datasets": total_datasets,
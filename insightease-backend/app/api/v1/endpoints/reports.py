@@ -2,17 +2,20 @@
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Response
 from fastapi.responses import FileResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc
+from sqlalchemy import select, desc, or_, and_
+import asyncio
+import hashlib
+import json
 import uuid
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
 from pathlib import Path
 
 from app.core.database import get_db
 from app.core.config import settings
-from app.models import Dataset, Analysis
+from app.models import Dataset, Analysis, Report
 from app.schemas.base import ResponseModel
-from app.schemas.report import ReportCreateRequest, ReportFormat
+from app.schemas.report import ReportCreateRequest, ReportFormat, ReportResponse
 from app.services.report_service import report_service
 import pandas as pd
 
@@ -22,8 +25,13 @@ router = APIRouter()
 REPORTS_DIR = Path("./data/reports")
 REPORTS_DIR.mkdir(parents=True, exist_ok=True)
 
+# 相同输入的报告在该时间内直接复用已生成的文件，不重新渲染
+REPORT_CACHE_TTL = timedelta(days=1)
+# 超过该时间仍处于生成中的报告视为已中断（如 worker 重启），不再复用
+REPORT_GENERATING_TIMEOUT = timedelta(minutes=10)
 
-@router.post("/generate")
+
+@router.post("/generate", status_code=202)
 async def generate_report(
     request: ReportCreateRequest,
     background_tasks: BackgroundTasks,
@@ -33,10 +41,45 @@ async def generate_report(
     生成分析报告
     
     支持格式：pdf, word, html
+    报告在后台生成，立即返回报告ID；通过 /status/{report_id} 查询进度，完成后下载
     """
-    # 获取数据集
-    result = await db.execute(
-        select(Dataset).where(Dataset.id == request.dataset_id, Dataset.is_deleted == False)
+    from app.core.database import AsyncSessionLocal
+    
+    async def fetch_analysis_results():
+        # 同一个会话不能并发执行查询，分析结果用单独的会话（连接池中另一个连接）
+        async with AsyncSessionLocal() as session:
+            if request.include_analysis:
+                # 获取指定的分析结果：一次 IN 查询取回，再按请求中的顺序排列
+                analyses_result = await session.execute(
+                    select(Analysis).where(
+                        Analysis.id.in_(request.include_analysis),
+                        Analysis.status == "completed"
+                    )
+                )
+                analyses_by_id = {analysis.id: analysis for analysis in analyses_result.scalars()}
+                analyses = [analyses_by_id.get(analysis_id) for analysis_id in request.include_analysis]
+            else:
+                # 获取该数据集的所有已完成分析
+                analyses_result = await session.execute(
+                    select(Analysis)
+                    .where(Analysis.dataset_id == request.dataset_id, Analysis.status == "completed")
+                    .order_by(desc(Analysis.created_at))
+                    .limit(10)
+                )
+                analyses = analyses_result.scalars().all()
+            
+            return [
+                {"type": analysis.type, "data": analysis.result_data}
+                for analysis in analyses
+                if analysis and analysis.result_data
+            ]
+    
+    # 数据集和分析结果只依赖请求参数，两个查询并发执行
+    result, analysis_results = await asyncio.gather(
+        db.execute(
+            select(Dataset).where(Dataset.id == request.dataset_id, Dataset.is_deleted == False)
+        ),
+        fetch_analysis_results()
     )
     dataset = result.scalar_one_or_none()
     if not dataset:
@@ -48,36 +91,6 @@ async def generate_report(
     # 设置默认标题
     title = request.title or f"{dataset.filename} 数据分析报告"
     
-    # 获取分析结果
-    analysis_results = []
-    if request.include_analysis:
-        # 获取指定的分析结果
-        for analysis_id in request.include_analysis:
-            analysis_result = await db.execute(
-                select(Analysis).where(Analysis.id == analysis_id)
-            )
-            analysis = analysis_result.scalar_one_or_none()
-            if analysis and analysis.status == "completed" and analysis.result_data:
-                analysis_results.append({
-                    "type": analysis.type,
-                    "data": analysis.result_data
-                })
-    else:
-        # 获取该数据集的所有已完成分析
-        analyses_result = await db.execute(
-            select(Analysis)
-            .where(Analysis.dataset_id == request.dataset_id, Analysis.status == "completed")
-            .order_by(desc(Analysis.created_at))
-            .limit(10)
-        )
-        analyses = analyses_result.scalars().all()
-        for analysis in analyses:
-            if analysis.result_data:
-                analysis_results.append({
-                    "type": analysis.type,
-                    "data": analysis.result_data
-                })
-    
     # 准备数据集信息
     dataset_info = {
         "filename": dataset.filename,
@@ -89,47 +102,165 @@ async def generate_report(
     
     ai_summary = dataset.ai_summary
     
-    # 生成报告文件
-    file_ext = request.format.value
-    filename = f"report_{report_id}.{file_ext}"
-    filepath = REPORTS_DIR / filename
+    # 相同输入（格式、标题、数据集信息、分析结果、AI 摘要）的报告内容相同，近期生成过的直接复用
+    cache_key = _report_cache_key(request.format, title, dataset_info, analysis_results, ai_summary)
+    now = datetime.now()
+    cached_result = await db.execute(
+        select(Report)
+        .where(
+            Report.cache_key == cache_key,
+            Report.created_at >= now - REPORT_CACHE_TTL,
+            or_(
+                Report.status == "completed",
+                and_(
+                    Report.status == "generating",
+                    Report.created_at >= now - REPORT_GENERATING_TIMEOUT
+                )
+            )
+        )
+        .order_by(desc(Report.created_at))
+        .limit(1)
+    )
+    cached = cached_result.scalar_one_or_none()
+    if cached and (cached.status == "generating" or _report_path(cached.id, cached.format).exists()):
+        return _report_task_response(cached, "报告已生成，直接复用")
+    
+    # 先记录生成中的报告并立即返回，PDF/Word 渲染较慢，放到后台执行
+    report = Report(
+        id=report_id,
+        dataset_id=dataset.id,
+        title=title,
+        format=request.format.value,
+        status="generating",
+        analysis_count=len(analysis_results),
+        cache_key=cache_key,
+        created_at=datetime.now()
+    )
+    db.add(report)
+    await db.commit()
     
+    background_tasks.add_task(
+        run_report_job, report_id, request.format, title, dataset_info, analysis_results, ai_summary
+    )
+    
+    return _report_task_response(report, "报告生成任务已创建")
+
+
+def _report_path(report_id: str, file_ext: str) -> Path:
+    """报告文件路径"""
+    return REPORTS_DIR / f"report_{report_id}.{file_ext}"
+
+
+def _report_cache_key(report_format: ReportFormat, title: str, dataset_info: dict,
+                      analysis_results: list, ai_summary) -> str:
+    """按生成报告的全部输入计算缓存键，输入相同则报告内容相同"""
+    payload = json.dumps(
+        [report_format.value, title, dataset_info, analysis_results, ai_summary],
+        ensure_ascii=False, sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _report_task_response(report: Report, message: str) -> ResponseModel:
+    """生成报告接口的响应：生成中返回 202，已完成（复用）返回 200"""
+    return ResponseModel(code=202 if report.status == "generating" else 200, message=message, data={
+        "report_id": report.id,
+        "title": report.title,
+        "format": report.format,
+        "filename": _report_path(report.id, report.format).name,
+        "download_url": f"/api/v1/reports/download/{report.id}?format={report.format}",
+        "status_url": f"/api/v1/reports/status/{report.id}",
+        "status": report.status,
+        "created_at": report.created_at,
+        "analysis_count": report.analysis_count
+    })
+
+
+def _write_report_file(report_format: ReportFormat, filepath: Path, title: str,
+                       dataset_info: dict, analysis_results: list, ai_summary):
+    """
+    生成报告并写入文件（同步渲染，在线程池中执行）
+    PDF/Word 由生成器直接写入文件，不在内存中保留整个报告
+    """
+    # 先写临时文件再替换，下载接口不会读到写了一半的文件
+    tmp_path = filepath.with_name(f"{filepath.name}.{uuid.uuid4().hex}.tmp")
     try:
-        if request.format == ReportFormat.PDF:
-            content = report_service.generate_pdf_report(
-                title, dataset_info, analysis_results, ai_summary
+        if report_format == ReportFormat.PDF:
+            report_service.generate_pdf_report(
+                title, dataset_info, analysis_results, ai_summary, output=str(tmp_path)
             )
-            with open(filepath, "wb") as f:
-                f.write(content)
-                
-        elif request.format == ReportFormat.WORD:
-            content = report_service.generate_word_report(
-                title, dataset_info, analysis_results, ai_summary
+        elif report_format == ReportFormat.WORD:
+            report_service.generate_word_report(
+                title, dataset_info, analysis_results, ai_summary, output=str(tmp_path)
             )
-            with open(filepath, "wb") as f:
-                f.write(content)
-                
-        elif request.format == ReportFormat.HTML:
+        else:
             content = report_service.generate_html_file(
                 title, dataset_info, analysis_results, ai_summary
             )
-            with open(filepath, "w", encoding="utf-8") as f:
+            with open(tmp_path, "w", encoding="utf-8") as f:
                 f.write(content)
-        
-        return ResponseModel(data={
-            "report_id": report_id,
-            "title": title,
-            "format": request.format.value,
-            "filename": filename,
-            "download_url": f"/api/v1/reports/download/{report_id}?format={file_ext}",
-            "status": "completed",
-            "message": "报告生成成功",
-            "created_at": datetime.now(),
-            "analysis_count": len(analysis_results)
-        })
-        
+        os.replace(tmp_path, filepath)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
+async def run_report_job(report_id: str, report_format: ReportFormat, title: str,
+                         dataset_info: dict, analysis_results: list, ai_summary):
+    """
+    后台生成报告
+    注意：后台任务需要自己创建数据库会话
+    """
+    from app.core.database import AsyncSessionLocal
+    
+    filepath = _report_path(report_id, report_format.value)
+    try:
+        await asyncio.to_thread(
+            _write_report_file, report_format, filepath, title, dataset_info, analysis_results, ai_summary
+        )
+        status, error_msg = "completed", None
     except Exception as e:
-        return ResponseModel(code=500, message=f"报告生成失败: {str(e)}")
+        status, error_msg = "failed", f"报告生成失败: {str(e)}"
+    
+    async with AsyncSessionLocal() as db:
+        report = await db.get(Report, report_id)
+        if report:
+            report.status = status
+            report.error_msg = error_msg
+            report.completed_at = datetime.now()
+            await db.commit()
+
+
+@router.get("/status/{report_id}")
+async def get_report_status(report_id: str, db: AsyncSession = Depends(get_db)):
+    """
+    查询报告生成状态（generating, completed, failed），供前端轮询
+    """
+    report = await db.get(Report, report_id)
+    if not report:
+        raise HTTPException(404, detail="报告不存在")
+    
+    # 生成任务已中断的报告标记为失败，前端不再无限轮询
+    if report.status == "generating" and report.created_at < datetime.now() - REPORT_GENERATING_TIMEOUT:
+        report.status = "failed"
+        report.error_msg = "报告生成超时，请重新生成"
+        report.completed_at = datetime.now()
+        await db.commit()
+    
+    return ResponseModel(data=ReportResponse(
+        id=report.id,
+        title=report.title,
+        format=report.format,
+        dataset_id=report.dataset_id,
+        file_url=(
+            f"/api/v1/reports/download/{report.id}?format={report.format}"
+            if report.status == "completed" else None
+        ),
+        status=report.status,
+        message=report.error_msg,
+        created_at=report.created_at,
+        completed_at=report.completed_at
+    ))
 
 
 @router.get("/download/{report_id}")
@@ -189,10 +320,13 @@ async def preview_report(report_id: str, format: str = "html"):
 
 
 @router.get("/formats")
-async def get_supported_formats():
+async def get_supported_formats(response: Response):
     """
     获取支持的报告格式
     """
+    # 格式列表是静态的，允许客户端缓存
+    response.headers["Cache-Control"] = "public, max-age=3600"
+    
     formats = [
         {
             "value": "pdf",
@@ -220,6 +354,7 @@ async def get_supported_formats():
 @router.post("/quick/{dataset_id}")
 async def quick_generate_report(
     dataset_id: str,
+    background_tasks: BackgroundTasks,
     format: ReportFormat = ReportFormat.PDF,
     db: AsyncSession = Depends(get_db)
 ):
@@ -232,8 +367,5 @@ async def quick_generate_report(
         include_analysis=[]
     )
     
-    # 复用generate_report逻辑
-    from fastapi import BackgroundTasks
-    background_tasks = BackgroundTasks()
-    
+    # 复用generate_report逻辑（后台任务需要使用本次请求的 BackgroundTasks 才会执行）
     return await generate_report(request, background_tasks, db)
@@ -1,4 +1,4 @@
-from pydantic_settings import BaseSettings
+from pydantic_settings import BaseSettings, SettingsConfigDict
 from functools import lru_cache
 from urllib.parse import quote_plus
 
@@ -18,6 +18,15 @@ class Settings(BaseSettings):
     DB_PASSWORD: str = "password"
     DB_NAME: str = "insightease"
     
+    # 连接池配置（每个 worker 进程一个连接池）
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_RECYCLE: int = 1800  # 秒，早于 MySQL 的 wait_timeout 回收空闲连接
+    
+    # 分析进程池大小（每个 worker 进程一个进程池）；0 表示按 CPU 核数除以 uvicorn worker 数自动计算
+    ANALYSIS_POOL_WORKERS: int = 0
+    UVICORN_WORKERS: int = 2  # 与 Dockerfile 中的 --workers 保持一致
+    
     @property
     def DATABASE_URL(self) -> str:
         # 对密码进行URL编码，处理特殊字符如 @
@@ -57,9 +66,7 @@ class Settings(BaseSettings):
     # 日志配置
     LOG_LEVEL: str = "DEBUG"
 
-    class Config:
-        env_file = ".env"
-        env_file_encoding = "utf-8"
+    model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
 
 @lru_cache
 def get_settings():
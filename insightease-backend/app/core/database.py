@@ -6,10 +6,10 @@ from app.core.config import settings
 engine = create_async_engine(
     settings.DATABASE_URL,
     echo=False,
-    pool_size=5,
-    max_overflow=10,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
     pool_pre_ping=True,
-    pool_recycle=3600
+    pool_recycle=settings.DB_POOL_RECYCLE
 )
 
 AsyncSessionLocal = async_sessionmaker(
@@ -32,9 +32,43 @@ async def get_db():
         finally:
             await session.close()
 
+# create_all 只建新表、不修改已有表，后续新增的列在这里补上：(表名, 列名, 列定义)
+_ADDED_COLUMNS = [
+    ("datasets", "ai_digest", "JSON NULL"),
+]
+
+def _add_missing_columns(sync_conn):
+    """为已存在的旧表补充新增列"""
+    from sqlalchemy import inspect, text
+    
+    inspector = inspect(sync_conn)
+    table_names = set(inspector.get_table_names())
+    for table, column, ddl in _ADDED_COLUMNS:
+        if table not in table_names:
+            continue
+        existing = {c["name"] for c in inspector.get_columns(table)}
+        if column not in existing:
+            sync_conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+def _create_missing_indexes(sync_conn):
+    """为已存在的旧表补建模型中后续声明的索引"""
+    from sqlalchemy import inspect
+    
+    inspector = inspect(sync_conn)
+    table_names = set(inspector.get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in table_names:
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(sync_conn)
+
 async def init_db():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_add_missing_columns)
+        await conn.run_sync(_create_missing_indexes)
 
 async def close_db():
     await engine.dispose()
\ No newline at end of file
@@ -0,0 +1,80 @@
+"""CPU密集型任务专用执行器"""
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+from app.core.config import settings
+
+# pandas 解析/统计线程池：线程数按 CPU 核数限制，避免大文件并发解析时过度争抢 GIL，
+# 也不占用默认线程池中处理 I/O 的线程
+parse_pool = ThreadPoolExecutor(
+    max_workers=min(4, os.cpu_count() or 1),
+    thread_name_prefix="parse"
+)
+
+# 分析任务进程池：sklearn/Prophet 等纯 Python/CPU 计算绕开 GIL，多核并行
+# 服务进程中已有多个线程，使用 spawn 启动子进程，避免 fork 带来的锁状态问题
+def _analysis_pool_size() -> int:
+    """进程池大小：优先使用配置，否则多个 uvicorn worker 平分 CPU 核数"""
+    if settings.ANALYSIS_POOL_WORKERS > 0:
+        return settings.ANALYSIS_POOL_WORKERS
+    return max(1, (os.cpu_count() or 1) // max(1, settings.UVICORN_WORKERS))
+
+
+def _create_analysis_pool() -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(
+        max_workers=_analysis_pool_size(),
+        mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+analysis_pool = _create_analysis_pool()
+_analysis_pool_lock = threading.Lock()
+
+
+def _reset_analysis_pool(broken_pool: ProcessPoolExecutor) -> ProcessPoolExecutor:
+    """
+    子进程异常退出（如内存不足被杀）后进程池会永久不可用，这里换成新的进程池
+    多个任务同时发现进程池损坏时只重建一次
+    """
+    global analysis_pool
+    with _analysis_pool_lock:
+        if analysis_pool is broken_pool:
+            broken_pool.shutdown(wait=False, cancel_futures=True)
+            analysis_pool = _create_analysis_pool()
+        return analysis_pool
+
+
+async def run_in_parse_pool(func, *args, **kwargs):
+    """在解析线程池中执行同步函数"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(parse_pool, partial(func, *args, **kwargs))
+
+
+async def run_in_analysis_pool(func, *args, **kwargs):
+    """
+    在分析进程池中执行函数（函数和参数需可 pickle）
+    进程池损坏时重建并重试一次；仍然失败则只让本任务报错
+    """
+    loop = asyncio.get_running_loop()
+    call = partial(func, *args, **kwargs)
+    pool = analysis_pool
+    try:
+        return await loop.run_in_executor(pool, call)
+    except BrokenProcessPool:
+        pool = _reset_analysis_pool(pool)
+    try:
+        return await loop.run_in_executor(pool, call)
+    except BrokenProcessPool:
+        _reset_analysis_pool(pool)
+        raise
+
+
+def shutdown_executors():
+    """关闭线程池和进程池（应用关闭时调用）"""
+    parse_pool.shutdown(wait=False, cancel_futures=True)
+    analysis_pool.shutdown(wait=False, cancel_futures=True)
@@ -1,4 +1,9 @@
 """安全工具 - 密码哈希和JWT"""
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Optional, Union
 from jose import JWTError, jwt
@@ -9,6 +14,12 @@ from app.core.config import settings
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7天
 
+# 已验证令牌的解码结果缓存：键为令牌的 SHA-256 摘要（不保存原始令牌），
+# 同一令牌短时间内重复请求时省去签名校验和 JSON 解析
+_TOKEN_CACHE_SIZE = 10000
+_TOKEN_CACHE_TTL = 30  # 秒
+_TOKEN_CACHE: "OrderedDict[bytes, tuple]" = OrderedDict()
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """验证密码"""
@@ -28,6 +39,23 @@ def get_password_hash(password: str) -> str:
     return hashed.decode('utf-8')
 
 
+# bcrypt 计算是 CPU 密集的（单次数十到数百毫秒），放到线程中执行不阻塞事件循环；
+# 同时进行的哈希计算数不超过 CPU 核数，避免大量登录/注册请求占满线程池
+_password_hash_semaphore = asyncio.Semaphore(os.cpu_count() or 1)
+
+
+async def averify_password(plain_password: str, hashed_password: str) -> bool:
+    """验证密码（在线程中执行）"""
+    async with _password_hash_semaphore:
+        return await asyncio.to_thread(verify_password, plain_password, hashed_password)
+
+
+async def aget_password_hash(password: str) -> str:
+    """获取密码哈希（在线程中执行）"""
+    async with _password_hash_semaphore:
+        return await asyncio.to_thread(get_password_hash, password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """创建JWT访问令牌"""
     to_encode = data.copy()
@@ -49,3 +77,26 @@ def decode_access_token(token: str) -> Optional[dict]:
         return payload
     except JWTError:
         return None
+
+
+def decode_access_token_cached(token: str) -> Optional[dict]:
+    """
+    解码JWT令牌（带短期缓存）
+    缓存项超过 _TOKEN_CACHE_TTL 秒或令牌已过期时重新解码，过期令牌仍会被拒绝
+    """
+    key = hashlib.sha256(token.encode()).digest()[:16]
+    now = time.time()
+    cached = _TOKEN_CACHE.get(key)
+    if cached is not None:
+        payload, cached_at = cached
+        if now - cached_at < _TOKEN_CACHE_TTL and payload.get("exp", 0) > now:
+            _TOKEN_CACHE.move_to_end(key)
+            return payload
+        del _TOKEN_CACHE[key]
+    
+    payload = decode_access_token(token)
+    if payload is not None:
+        _TOKEN_CACHE[key] = (payload, now)
+        if len(_TOKEN_CACHE) > _TOKEN_CACHE_SIZE:
+            _TOKEN_CACHE.popitem(last=False)
+    return payload
@@ -2,10 +2,14 @@
 存储服务 - 支持本地文件系统和阿里云 OSS
 """
 
+import asyncio
 import os
+import shutil
 from typing import BinaryIO, Optional
 from pathlib import Path
 
+import aiofiles
+
 
 class StorageBackend:
     """存储后端抽象基类"""
@@ -14,6 +18,15 @@ class StorageBackend:
         """保存文件，返回存储路径/URL"""
         raise NotImplementedError
     
+    async def save_file(self, file_id: str, filename: str, src_path: str) -> str:
+        """
+        保存本地已有的文件，返回存储路径/URL
+        源文件可能被移动，调用方之后不应再使用 src_path
+        """
+        async with aiofiles.open(src_path, "rb") as f:
+            file_data = await f.read()
+        return await self.save(file_id, filename, file_data)
+    
     async def exists(self, file_path: str) -> bool:
         """检查文件是否存在"""
         raise NotImplementedError
@@ -22,6 +35,10 @@ class StorageBackend:
         """读取文件内容"""
         raise NotImplementedError
     
+    async def read_head(self, file_path: str, nbytes: int) -> bytes:
+        """读取文件开头的至多 nbytes 个字节"""
+        return (await self.read(file_path))[:nbytes]
+    
     async def delete(self, file_path: str) -> bool:
         """删除文件"""
         raise NotImplementedError
@@ -38,22 +55,35 @@ class LocalStorage(StorageBackend):
         self.upload_dir = Path(upload_dir)
         self.upload_dir.mkdir(parents=True, exist_ok=True)
     
+    def _local_path(self, file_id: str, filename: str) -> Path:
+        safe_name = f"{file_id}_{filename.replace(' ', '_')}"
+        return self.upload_dir / safe_name
+    
     async def save(self, file_id: str, filename: str, file_data: bytes) -> str:
         """保存到本地目录"""
-        safe_name = f"{file_id}_{filename.replace(' ', '_')}"
-        filepath = self.upload_dir / safe_name
+        filepath = self._local_path(file_id, filename)
         
-        with open(filepath, "wb") as f:
-            f.write(file_data)
+        async with aiofiles.open(filepath, "wb") as f:
+            await f.write(file_data)
         
         return str(filepath)
     
+    async def save_file(self, file_id: str, filename: str, src_path: str) -> str:
+        """把本地文件移动到存储目录（同一文件系统内只是重命名，不复制数据）"""
+        filepath = self._local_path(file_id, filename)
+        await asyncio.to_thread(shutil.move, src_path, filepath)
+        return str(filepath)
+    
     async def exists(self, file_path: str) -> bool:
         return Path(file_path).exists()
     
     async def read(self, file_path: str) -> bytes:
-        with open(file_path, "rb") as f:
-            return f.read()
+        async with aiofiles.open(file_path, "rb") as f:
+            return await f.read()
+    
+    async def read_head(self, file_path: str, nbytes: int) -> bytes:
+        async with aiofiles.open(file_path, "rb") as f:
+            return await f.read(nbytes)
     
     async def delete(self, file_path: str) -> bool:
         try:
@@ -86,6 +116,12 @@ class AliyunOSSStorage(StorageBackend):
         # 返回 OSS URL
         return f"oss://{self.bucket_name}/{object_key}"
     
+    async def save_file(self, file_id: str, filename: str, src_path: str) -> str:
+        """从本地文件上传到 OSS（在线程中执行，不阻塞事件循环）"""
+        object_key = f"datasets/{file_id}_{filename}"
+        await asyncio.to_thread(self.bucket.put_object_from_file, object_key, src_path)
+        return f"oss://{self.bucket_name}/{object_key}"
+    
     async def exists(self, file_path: str) -> bool:
         """检查 OSS 对象是否存在"""
         if file_path.startswith("oss://"):
@@ -100,6 +136,18 @@ class AliyunOSSStorage(StorageBackend):
             return self.bucket.get_object(object_key).read()
         raise ValueError(f"Invalid OSS path: {file_path}")
     
+    async def read_head(self, file_path: str, nbytes: int) -> bytes:
+        """按字节范围下载对象开头部分（对象小于 nbytes 时返回整个对象，在线程中执行，不阻塞事件循环）"""
+        if file_path.startswith("oss://"):
+            object_key = file_path.replace(f"oss://{self.bucket_name}/", "")
+            
+            def download_head() -> bytes:
+                # 请求和读取响应体都是阻塞调用
+                return self.bucket.get_object(object_key, byte_range=(0, nbytes - 1)).read()
+            
+            return await asyncio.to_thread(download_head)
+        raise ValueError(f"Invalid OSS path: {file_path}")
+    
     async def delete(self, file_path: str) -> bool:
         """从 OSS 删除"""
         try:
@@ -7,7 +7,9 @@ import traceback
 
 from app.core.config import settings
 from app.core.database import init_db, close_db
+from app.core.executor import shutdown_executors
 from app.api.v1.api import api_router
+from app.services.ai_service import ai_service
 
 # 导入模型确保表被创建
 from app.models import Dataset, Analysis
@@ -25,6 +27,8 @@ async def lifespan(app: FastAPI):
     logger.info(f"Environment: {settings.ENVIRONMENT}")
     await init_db()
     yield
+    await ai_service.close()
+    shutdown_executors()
     await close_db()
     logger.info("Application shutdown")
 
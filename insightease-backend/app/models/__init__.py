@@ -1 +1 @@
-from app.models.models import User, Dataset, Analysis
+from app.models.models import User, Dataset, Analysis, Report
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, DateTime, Text, JSON, ForeignKey, Boolean
+from sqlalchemy import Column, String, Integer, DateTime, Text, JSON, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
@@ -29,7 +29,13 @@ class User(Base):
 
 class Dataset(Base):
     __tablename__ = "datasets"
-    __table_args__ = {"mysql_engine": "InnoDB", "mysql_charset": "utf8mb4"}
+    __table_args__ = (
+        # 按用户和文件名前缀查找处理后的数据集版本
+        Index("ix_datasets_user_filename", "user_id", "filename"),
+        # 列表、汇总和详情查询都按用户过滤未删除的数据集，并按创建时间倒序分页
+        Index("ix_datasets_user_deleted_created", "user_id", "is_deleted", "created_at"),
+        {"mysql_engine": "InnoDB", "mysql_charset": "utf8mb4"},
+    )
     
     id = Column(String(36), primary_key=True, index=True)
     user_id = Column(String(36), ForeignKey("users.id", ondelete="CASCADE"), index=True, nullable=False)
@@ -41,6 +47,7 @@ class Dataset(Base):
     schema = Column(JSON, default=list)
     quality_score = Column(Integer, nullable=True)
     ai_summary = Column(Text, nullable=True)
+    ai_digest = Column(JSON, nullable=True)  # AI接口使用的数据摘要，上传时生成
     status = Column(String(20), default="uploaded")
     is_deleted = Column(Boolean, default=False)
     
@@ -52,7 +59,13 @@ class Dataset(Base):
 
 class Analysis(Base):
     __tablename__ = "analyses"
-    __table_args__ = {"mysql_engine": "InnoDB", "mysql_charset": "utf8mb4"}
+    __table_args__ = (
+        # 报告取数据集最近的已完成分析：按数据集和状态过滤并按创建时间倒序
+        Index("ix_analyses_dataset_status_created", "dataset_id", "status", "created_at"),
+        # 分析列表按用户过滤并按创建时间倒序分页
+        Index("ix_analyses_user_created", "user_id", "created_at"),
+        {"mysql_engine": "InnoDB", "mysql_charset": "utf8mb4"},
+    )
     
     id = Column(String(36), primary_key=True, index=True)
     user_id = Column(String(36), ForeignKey("users.id", ondelete="CASCADE"), index=True, nullable=False)
@@ -70,4 +83,22 @@ class Analysis(Base):
     completed_at = Column(DateTime(timezone=True), nullable=True)
     
     owner = relationship("User", back_populates="analyses")
-    dataset = relationship("Dataset", back_populates="analyses")
\ No newline at end of file
+    dataset = relationship("Dataset", back_populates="analyses")
+
+
+class Report(Base):
+    __tablename__ = "reports"
+    __table_args__ = {"mysql_engine": "InnoDB", "mysql_charset": "utf8mb4"}
+    
+    id = Column(String(36), primary_key=True, index=True)
+    dataset_id = Column(String(36), ForeignKey("datasets.id", ondelete="CASCADE"), index=True)
+    title = Column(String(255), nullable=False)
+    format = Column(String(10), nullable=False)
+    status = Column(String(20), default="generating")
+    analysis_count = Column(Integer, default=0)
+    # 生成报告全部输入的哈希，输入相同的报告可以直接复用
+    cache_key = Column(String(64), index=True, nullable=True)
+    error_msg = Column(Text, nullable=True)
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    completed_at = Column(DateTime(timezone=True), nullable=True)
@@ -1,5 +1,5 @@
 """AI相关的Schemas"""
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 
@@ -72,5 +72,4 @@ class AIInsight(BaseModel):
     content: Dict[str, Any]
     created_at: datetime
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
@@ -1,21 +1,41 @@
 """AI智能分析服务"""
+import asyncio
 import json
+import math
+import httpx
 import pandas as pd
-from typing import Dict, Any, List, Optional, AsyncGenerator
+from typing import Dict, Any, List, Optional, AsyncGenerator, Union
 from openai import AsyncOpenAI
 from app.core.config import settings
+from app.core.executor import run_in_parse_pool
+
+# 行数超过该值时，数据摘要的各部分并行计算
+PARALLEL_DIGEST_MIN_ROWS = 100_000
+
+# 参与AI分析的最大列数，过宽的数据集只保留前面的列，避免提示词过大
+MAX_DIGEST_COLUMNS = 200
 
 
 class AIService:
     """AI智能分析服务类"""
     
     def __init__(self):
+        # 进程内共享一个带连接池的 HTTP 客户端，复用 TCP/TLS 连接
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+            timeout=httpx.Timeout(60.0, connect=5.0)
+        )
         self.client = AsyncOpenAI(
             api_key=settings.KIMI_API_KEY,
-            base_url=settings.KIMI_BASE_URL
+            base_url=settings.KIMI_BASE_URL,
+            http_client=self.http_client
         )
         self.model = settings.KIMI_MODEL
     
+    async def close(self):
+        """关闭 HTTP 连接池（应用关闭时调用）"""
+        await self.client.close()
+    
     def _is_available(self) -> bool:
         """检查AI服务是否可用"""
         return bool(settings.KIMI_API_KEY)
@@ -57,13 +77,15 @@ class AIService:
         except Exception as e:
             yield f"[AI调用失败: {str(e)}]"
     
-    async def interpret_data(self, df: pd.DataFrame, 
+    async def interpret_data(self, data: Union[pd.DataFrame, Dict[str, Any]], 
                             analysis_type: str = "general") -> Dict[str, Any]:
         """
         AI解读数据，生成数据洞察
+        data 可以是 DataFrame，也可以是 build_digest 生成的数据摘要
         """
         # 准备数据摘要
-        data_summary = self._prepare_data_summary(df)
+        digest = self._ensure_digest(data)
+        data_summary = digest["summary"]
         
         prompts = {
             "general": f"""你是一位专业的数据分析师。请对以下数据进行深入解读，提供3-5个关键洞察：
@@ -121,12 +143,13 @@ class AIService:
             "summary": data_summary
         }
     
-    async def generate_suggestions(self, df: pd.DataFrame,
+    async def generate_suggestions(self, data: Union[pd.DataFrame, Dict[str, Any]],
                                    context: str = None) -> List[Dict[str, Any]]:
         """
         生成智能分析建议
         """
-        data_summary = self._prepare_data_summary(df)
+        digest = self._ensure_digest(data)
+        data_summary = digest["summary"]
         
         context_info = f"\n用户背景：{context}" if context else ""
         
@@ -171,20 +194,21 @@ class AIService:
                 suggestions = json.loads(response)
         except:
             # 如果解析失败，返回默认建议
-            suggestions = self._get_default_suggestions(df)
+            suggestions = self._get_default_suggestions(digest)
         
         return suggestions
     
-    async def answer_question(self, df: pd.DataFrame, 
+    async def answer_question(self, data: Union[pd.DataFrame, Dict[str, Any]], 
                              question: str,
                              chat_history: List[Dict] = None) -> Dict[str, Any]:
         """
         回答关于数据的问题
         """
-        data_summary = self._prepare_data_summary(df)
+        digest = self._ensure_digest(data)
+        data_summary = digest["summary"]
         
         # 先计算一些可能需要的统计数据
-        stats_context = self._compute_relevant_stats(df, question)
+        stats_context = self._compute_relevant_stats(digest, question)
         
         prompt = f"""你是一位数据分析师。请基于以下数据回答用户的问题。
 
@@ -235,6 +259,104 @@ class AIService:
         async for chunk in self._call_kimi_stream(messages):
             yield chunk
     
+    def build_digest(self, df: pd.DataFrame) -> Dict[str, Any]:
+        """
+        生成数据集AI摘要（可JSON序列化）
+        包含提示词用的文本摘要、问答用的统计值和列类型计数，
+        上传时计算一次并持久化，AI接口无需再读取原始文件
+        """
+        df, total_columns = self._limit_columns(df)
+        digest = {
+            "summary": self._prepare_data_summary(df),
+            "numeric_stats": self._digest_numeric_stats(df),
+            "column_counts": self._digest_column_counts(df)
+        }
+        return self._annotate_truncation(digest, total_columns)
+    
+    async def build_digest_async(self, df: pd.DataFrame) -> Dict[str, Any]:
+        """
+        生成数据集AI摘要（异步版本）
+        数据量较大时，摘要的三部分互不依赖，放到解析线程池中并行计算
+        """
+        if len(df) < PARALLEL_DIGEST_MIN_ROWS:
+            # 数据量小时不拆分，但仍放到线程池中计算，避免阻塞事件循环
+            return await run_in_parse_pool(self.build_digest, df)
+        
+        df, total_columns = self._limit_columns(df)
+        summary, numeric_stats, column_counts = await asyncio.gather(
+            run_in_parse_pool(self._prepare_data_summary, df),
+            run_in_parse_pool(self._digest_numeric_stats, df),
+            run_in_parse_pool(self._digest_column_counts, df)
+        )
+        digest = {
+            "summary": summary,
+            "numeric_stats": numeric_stats,
+            "column_counts": column_counts
+        }
+        return self._annotate_truncation(digest, total_columns)
+    
+    @staticmethod
+    def _limit_columns(df: pd.DataFrame):
+        """
+        截断过宽的数据集，返回 (截断后的DataFrame, 原始列数)
+        读取文件时已截断的，原始列数记录在 df.attrs["total_columns"]
+        """
+        total_columns = df.attrs.get("total_columns") or len(df.columns)
+        if len(df.columns) > MAX_DIGEST_COLUMNS:
+            df = df.iloc[:, :MAX_DIGEST_COLUMNS]
+        return df, total_columns
+    
+    @staticmethod
+    def _annotate_truncation(digest: Dict[str, Any], total_columns: int) -> Dict[str, Any]:
+        """列被截断时在摘要中注明，便于用户和模型知晓"""
+        if total_columns > MAX_DIGEST_COLUMNS:
+            digest["summary"] += f"\n\n注意：数据集共 {total_columns} 列，仅分析了前 {MAX_DIGEST_COLUMNS} 列"
+            digest["truncated_columns"] = total_columns
+        return digest
+    
+    def _digest_numeric_stats(self, df: pd.DataFrame) -> Dict[str, Dict[str, Any]]:
+        """问答可能用到的统计值（与提示词一致，只取前3个数值列）"""
+        numeric_cols = df.select_dtypes(include=['number']).columns
+        
+        numeric_stats = {}
+        for col in numeric_cols[:3]:
+            col_data = df[col].dropna()
+            if col_data.empty:
+                continue
+            numeric_stats[str(col)] = {
+                "max": self._to_json_scalar(col_data.max()),
+                "max_idx": str(col_data.idxmax()),
+                "min": self._to_json_scalar(col_data.min()),
+                "min_idx": str(col_data.idxmin()),
+                "mean": self._to_json_scalar(col_data.mean()),
+                "sum": self._to_json_scalar(col_data.sum())
+            }
+        return numeric_stats
+    
+    @staticmethod
+    def _digest_column_counts(df: pd.DataFrame) -> Dict[str, int]:
+        """各类型列的数量（用于默认建议）"""
+        return {
+            "numeric": len(df.select_dtypes(include=['number']).columns),
+            "categorical": len(df.select_dtypes(include=['object']).columns),
+            "datetime": len(df.select_dtypes(include=['datetime64']).columns)
+        }
+    
+    def _ensure_digest(self, data: Union[pd.DataFrame, Dict[str, Any]]) -> Dict[str, Any]:
+        """兼容旧调用方式：传入 DataFrame 时现场生成摘要"""
+        if isinstance(data, pd.DataFrame):
+            return self.build_digest(data)
+        return data
+    
+    @staticmethod
+    def _to_json_scalar(value):
+        """numpy 标量转为 Python 类型，NaN/Inf 转为 None"""
+        if hasattr(value, "item"):
+            value = value.item()
+        if isinstance(value, float) and not math.isfinite(value):
+            return None
+        return value
+    
     def _prepare_data_summary(self, df: pd.DataFrame) -> str:
         """准备数据摘要"""
         summary = []
@@ -269,54 +391,54 @@ class AIService:
         
         return "\n".join(summary)
     
-    def _compute_relevant_stats(self, df: pd.DataFrame, question: str) -> str:
-        """根据问题计算相关统计数据"""
+    def _compute_relevant_stats(self, digest: Dict[str, Any], question: str) -> str:
+        """根据问题挑选相关统计数据"""
         stats = []
         
         # 检查问题中是否提到最大值、最小值等
         question_lower = question.lower()
         
-        numeric_cols = df.select_dtypes(include=['number']).columns
+        numeric_stats = digest.get("numeric_stats", {})
         
         if any(kw in question_lower for kw in ["最大", "最高", "最多", "max"]):
-            for col in numeric_cols[:3]:
-                max_idx = df[col].idxmax()
-                max_row = df.loc[max_idx]
-                stats.append(f"{col}最大值: {df[col].max()} (行索引: {max_idx})")
+            for col, col_stats in numeric_stats.items():
+                stats.append(f"{col}最大值: {col_stats['max']} (行索引: {col_stats['max_idx']})")
         
         if any(kw in question_lower for kw in ["最小", "最低", "最少", "min"]):
-            for col in numeric_cols[:3]:
-                min_idx = df[col].idxmin()
-                stats.append(f"{col}最小值: {df[col].min()} (行索引: {min_idx})")
+            for col, col_stats in numeric_stats.items():
+                stats.append(f"{col}最小值: {col_stats['min']} (行索引: {col_stats['min_idx']})")
         
         if any(kw in question_lower for kw in ["平均", "均值", "mean", "average"]):
-            for col in numeric_cols[:3]:
-                stats.append(f"{col}平均值: {df[col].mean():.2f}")
+            for col, col_stats in numeric_stats.items():
+                if col_stats["mean"] is not None:
+                    stats.append(f"{col}平均值: {col_stats['mean']:.2f}")
         
         if any(kw in question_lower for kw in ["总和", "总计", "sum", "total"]):
-            for col in numeric_cols[:3]:
-                stats.append(f"{col}总和: {df[col].sum():.2f}")
+            for col, col_stats in numeric_stats.items():
+                if col_stats["sum"] is not None:
+                    stats.append(f"{col}总和: {col_stats['sum']:.2f}")
         
         return "\n".join(stats) if stats else "根据问题未计算额外统计"
     
-    def _get_default_suggestions(self, df: pd.DataFrame) -> List[Dict[str, Any]]:
+    def _get_default_suggestions(self, digest: Dict[str, Any]) -> List[Dict[str, Any]]:
         """获取默认建议"""
         suggestions = []
         
-        numeric_cols = df.select_dtypes(include=['number']).columns
-        categorical_cols = df.select_dtypes(include=['object']).columns
-        datetime_cols = df.select_dtypes(include=['datetime64']).columns
+        column_counts = digest.get("column_counts", {})
+        n_numeric = column_counts.get("numeric", 0)
+        n_categorical = column_counts.get("categorical", 0)
+        n_datetime = column_counts.get("datetime", 0)
         
-        if len(numeric_cols) >= 2:
+        if n_numeric >= 2:
             suggestions.append({
                 "type": "correlation",
                 "title": "相关性分析",
                 "description": "分析数值型变量之间的相关性，发现变量间的关联关系",
-                "reason": f"数据包含{len(numeric_cols)}个数值型列，适合进行相关性分析",
+                "reason": f"数据包含{n_numeric}个数值型列，适合进行相关性分析",
                 "priority": "high"
             })
         
-        if len(numeric_cols) > 0:
+        if n_numeric > 0:
             suggestions.append({
                 "type": "descriptive",
                 "title": "描述性统计分析",
@@ -333,7 +455,7 @@ class AIService:
                 "priority": "medium"
             })
         
-        if len(datetime_cols) > 0 and len(numeric_cols) > 0:
+        if n_datetime > 0 and n_numeric > 0:
             suggestions.append({
                 "type": "forecast",
                 "title": "时间序列预测",
@@ -342,12 +464,12 @@ class AIService:
                 "priority": "medium"
             })
         
-        if len(categorical_cols) > 0:
+        if n_categorical > 0:
             suggestions.append({
                 "type": "distribution",
                 "title": "分类分布分析",
                 "description": "分析分类变量的分布情况和占比",
-                "reason": f"数据包含{len(categorical_cols)}个分类型列",
+                "reason": f"数据包含{n_categorical}个分类型列",
                 "priority": "low"
             })
         
@@ -0,0 +1,566 @@
+"""
+分析任务执行
+纯计算函数，不依赖数据库会话，可在独立进程中运行
+"""
+import logging
+import re
+import pandas as pd
+import numpy as np
+from typing import Dict, Any, Tuple
+
+from app.services.analysis_service import AnalysisService
+from app.services.visualization_service import VisualizationService
+from app.services.prediction_service import PredictionService
+from app.services.path_analysis_service import PathAnalysisService
+from app.services.attribution_service import AttributionService
+from app.services.sequence_mining_service import SequenceMiningService
+
+logger = logging.getLogger(__name__)
+
+
+class AnalysisInputError(ValueError):
+    """数据不满足分析条件，任务直接标记为失败"""
+
+
+# 类型转换前用首个非空值快速判断列的类型
+_NUMERIC_RE = re.compile(r"^\s*[-+]?(\d+(\.\d*)?|\.\d+)([eE][-+]?\d+)?\s*$")
+
+
+def _convert_object_column(series: pd.Series) -> pd.Series:
+    """
+    文本列自动转换为数值或日期类型，无法整体转换时保持原样
+    按首个非空值选择一种转换，避免对每列都尝试两次完整解析：
+    首个值像数字时按数值转换，否则首个值能解析为日期（如 "2023-01"、"Jan 5, 2023"）时按日期转换
+    """
+    first_idx = series.first_valid_index()
+    if first_idx is None:
+        return series
+    first = series.loc[first_idx]
+    if not isinstance(first, str):
+        return series
+    
+    try:
+        if _NUMERIC_RE.match(first):
+            return pd.to_numeric(series)
+        # 先只解析首个值，普通文本列在这里就会失败，无需整列尝试
+        pd.to_datetime(first)
+        return pd.to_datetime(series)
+    except (ValueError, TypeError, OverflowError):
+        pass
+    return series
+
+
+def run_analysis(df: pd.DataFrame, analysis_type: str, params: dict) -> Dict[str, Any]:
+    """
+    执行分析并返回结果（smart_process 除外，见 smart_process）
+    """
+    result_data = {}
+    
+    if analysis_type == "descriptive":
+        # 描述性统计
+        logger.info("Running descriptive analysis...")
+        result_data = AnalysisService.descriptive_analysis(df)
+        logger.info(f"Descriptive analysis completed, columns: {len(result_data.get('column_stats', []))}")
+    
+    elif analysis_type == "correlation":
+        # 相关性分析
+        result_data = AnalysisService.correlation_analysis(df)
+    
+    elif analysis_type == "distribution":
+        # 分布分析
+        column = params.get("column")
+        if not column:
+            # 自动选择第一个数值列
+            numeric_cols = df.select_dtypes(include=['number']).columns
+            column = numeric_cols[0] if len(numeric_cols) > 0 else df.columns[0]
+        result_data = AnalysisService.distribution_analysis(df, column)
+    
+    elif analysis_type == "outlier":
+        # 异常值检测
+        column = params.get("column")
+        result_data = AnalysisService.outlier_detection(df, column)
+    
+    elif analysis_type == "visualization":
+        # 可视化分析
+        chart_type = params.get("chart_type", "auto")
+        
+        if chart_type == "auto":
+            # 自动生成图表
+            result_data = {
+                "charts": VisualizationService.auto_generate_charts(df)
+            }
+        elif chart_type == "histogram":
+            column = params.get("column", df.select_dtypes(include=['number']).columns[0])
+            result_data = VisualizationService.generate_histogram(df, column)
+        elif chart_type == "scatter":
+            x_col = params.get("x_column")
+            y_col = params.get("y_column")
+            if not x_col or not y_col:
+                numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
+                if len(numeric_cols) >= 2:
+                    x_col, y_col = numeric_cols[0], numeric_cols[1]
+            result_data = VisualizationService.generate_scatter_plot(df, x_col, y_col)
+        elif chart_type == "heatmap":
+            result_data = VisualizationService.generate_correlation_heatmap(df)
+        elif chart_type == "boxplot":
+            column = params.get("column", df.select_dtypes(include=['number']).columns[0])
+            result_data = VisualizationService.generate_box_plot(df, column)
+        else:
+            result_data = {"error": f"不支持的图表类型: {chart_type}"}
+    
+    elif analysis_type == "forecast":
+        # 时间序列预测（电商增强版）
+        value_col = params.get("value_column")
+        if not value_col:
+            # 自动选择数值列
+            numeric_cols = df.select_dtypes(include=['number']).columns
+            if len(numeric_cols) == 0:
+                raise AnalysisInputError("没有数值型列可供预测")
+            value_col = numeric_cols[0]
+        
+        periods = params.get("periods", 30)
+        model = params.get("model", "prophet")
+        promotions = params.get("promotions", [])
+        auxiliary_vars = params.get("auxiliary_variables", [])
+        
+        # 获取日期列
+        date_col = params.get("date_column")
+        if not date_col:
+            date_col = PredictionService.detect_datetime_column(df)
+        
+        if model == "prophet":
+            result_data = PredictionService.prophet_forecast(
+                df, date_col, value_col, periods,
+                promotions=promotions,
+                auxiliary_vars=auxiliary_vars
+            )
+        elif model == "lightgbm":
+            result_data = PredictionService.lightgbm_forecast(
+                df, date_col, value_col, periods,
+                promotions=promotions,
+                auxiliary_vars=auxiliary_vars
+            )
+        else:
+            # 默认使用 Prophet
+            result_data = PredictionService.prophet_forecast(
+                df, date_col, value_col, periods,
+                promotions=promotions,
+                auxiliary_vars=auxiliary_vars
+            )
+    
+    elif analysis_type == "what_if":
+        # What-if 分析：基于基准预测和变量调整
+        base_forecast = params.get("base_forecast")
+        adjustments = params.get("adjustments", [])
+        
+        if not base_forecast:
+            result_data = {"error": "缺少基准预测数据"}
+        else:
+            result_data = PredictionService.what_if_analysis(
+                base_forecast, adjustments
+            )
+    
+    elif analysis_type == "auto_model_select":
+        # 自动模型选择
+        logger.info("Starting auto model selection...")
+        
+        date_col = params.get("date_column") or PredictionService.detect_datetime_column(df)
+        value_col = params.get("value_column")
+        
+        if not value_col:
+            numeric_cols = df.select_dtypes(include=['number']).columns
+            if len(numeric_cols) == 0:
+                result_data = {"error": "没有数值型列可供预测"}
+            else:
+                value_col = numeric_cols[0]
+        
+        if date_col and value_col:
+            result_data = PredictionService.auto_select_model(
+                df, date_col, value_col, periods=params.get("periods", 30)
+            )
+        else:
+            result_data = {"error": "无法自动检测日期列或数值列"}
+    
+    elif analysis_type == "batch_forecast":
+        # 批量预测
+        logger.info("Starting batch forecast...")
+        
+        date_col = params.get("date_column") or PredictionService.detect_datetime_column(df)
+        value_cols = params.get("value_columns", [])
+        
+        # 如果没有指定列，使用所有数值列
+        if not value_cols:
+            value_cols = df.select_dtypes(include=['number']).columns.tolist()
+            # 排除可能的ID列
+            value_cols = [c for c in value_cols if not any(x in c.lower() for x in ['id', 'code', 'index'])]
+        
+        if len(value_cols) == 0:
+            result_data = {"error": "没有可用的数值列进行预测"}
+        elif len(value_cols) > 20:
+            result_data = {"error": "批量预测最多支持20个SKU/品类"}
+        else:
+            result_data = PredictionService.batch_forecast(
+                df, date_col, value_cols,
+                periods=params.get("periods", 30),
+                model=params.get("model", "prophet"),
+                promotions=params.get("promotions", [])
+            )
+    
+    elif analysis_type == "comprehensive":
+        # 综合分析（包含描述性统计、相关性、可视化）
+        # 三项计算依次执行：run_analysis 在分析进程池的子进程中运行，进程池已按核数分摊 CPU，
+        # 不再在子进程内开线程池
+        result_data = {
+            "descriptive": AnalysisService.descriptive_analysis(df),
+            "correlation": AnalysisService.correlation_analysis(df),
+            "visualizations": VisualizationService.auto_generate_charts(df, max_charts=4)
+        }
+    
+    elif analysis_type == "path":
+        # 路径分析
+        logger.info("Starting path analysis...")
+        path_type = params.get("path_type", "funnel")  # funnel, path, clustering, key_path
+        user_id_col = params.get("user_id_col")
+        event_col = params.get("event_col")
+        timestamp_col = params.get("timestamp_col")
+        
+        if not all([user_id_col, event_col, timestamp_col]):
+            raise ValueError("路径分析需要指定用户ID列、事件列和时间戳列")
+        
+        if path_type == "funnel":
+            funnel_steps = params.get("funnel_steps", [])
+            time_window = params.get("time_window")
+            if not funnel_steps:
+                raise ValueError("漏斗分析需要指定漏斗步骤")
+            result_data = PathAnalysisService.funnel_analysis(
+                df, user_id_col, event_col, timestamp_col, 
+                funnel_steps, time_window
+            )
+        
+        elif path_type == "path":
+            max_path_length = params.get("max_path_length", 10)
+            min_user_count = params.get("min_user_count", 5)
+            result_data = PathAnalysisService.path_analysis(
+                df, user_id_col, event_col, timestamp_col,
+                max_path_length, min_user_count
+            )
+        
+        elif path_type == "clustering":
+            n_clusters = params.get("n_clusters", 3)
+            max_path_length = params.get("max_path_length", 10)
+            result_data = PathAnalysisService.path_clustering(
+                df, user_id_col, event_col, timestamp_col,
+                n_clusters, max_path_length
+            )
+        
+        elif path_type == "key_path":
+            start_event = params.get("start_event")
+            end_event = params.get("end_event")
+            max_steps = params.get("max_steps", 10)
+            if not start_event or not end_event:
+                raise ValueError("关键路径分析需要指定起点和终点事件")
+            result_data = PathAnalysisService.key_path_analysis(
+                df, user_id_col, event_col, timestamp_col,
+                start_event, end_event, max_steps
+            )
+        
+        else:
+            raise ValueError(f"未知的路径分析类型: {path_type}")
+        
+        logger.info(f"Path analysis completed: {path_type}")
+    
+    elif analysis_type == "attribution":
+        # 归因分析
+        logger.info("Starting attribution analysis...")
+        user_id_col = params.get("user_id_col")
+        touchpoint_col = params.get("touchpoint_col")
+        timestamp_col = params.get("timestamp_col")
+        conversion_col = params.get("conversion_col")
+        conversion_value_col = params.get("conversion_value_col")
+        additional_touchpoint_cols = params.get("additional_touchpoint_cols")
+        models = params.get("models", ["first_touch", "last_touch", "linear"])
+        
+        if not all([user_id_col, touchpoint_col, timestamp_col]):
+            raise ValueError("归因分析需要指定用户ID列、触点列和时间戳列")
+        
+        result_data = AttributionService.attribution_analysis(
+            df, user_id_col, touchpoint_col, timestamp_col,
+            conversion_col, conversion_value_col, models,
+            additional_touchpoint_cols=additional_touchpoint_cols
+        )
+        logger.info(f"Attribution analysis completed with models: {models}")
+    
+    elif analysis_type == "sequence_mining":
+        # 序列模式挖掘
+        logger.info("Starting sequence pattern mining...")
+        user_id_col = params.get("user_id_col")
+        event_col = params.get("event_col")
+        timestamp_col = params.get("timestamp_col")
+        conversion_col = params.get("conversion_col")
+        additional_event_cols = params.get("additional_event_cols")
+        min_support = params.get("min_support", 0.1)
+        max_pattern_length = params.get("max_pattern_length", 5)
+        min_confidence = params.get("min_confidence", 0.5)
+        
+        if not all([user_id_col, event_col, timestamp_col]):
+            raise ValueError("序列模式挖掘需要指定用户ID列、事件列和时间戳列")
+        
+        result_data = SequenceMiningService.sequence_pattern_mining(
+            df, user_id_col, event_col, timestamp_col,
+            min_support=min_support,
+            max_pattern_length=max_pattern_length,
+            conversion_col=conversion_col,
+            min_confidence=min_confidence,
+            additional_event_cols=additional_event_cols
+        )
+        logger.info("Sequence pattern mining completed")
+    
+    else:
+        result_data = {"error": f"未知的分析类型: {analysis_type}"}
+    
+    return result_data
+
+
+# 数据点不少于该数量时使用 MiniBatchKMeans
+MINIBATCH_KMEANS_MIN_ROWS = 500
+# 轮廓系数的计算量与样本数平方成正比，只在该数量的抽样点上计算
+SILHOUETTE_SAMPLE_SIZE = 1000
+# 数据点超过该数量时不计算轮廓系数
+SILHOUETTE_MAX_ROWS = 20000
+
+
+def run_kmeans(data: np.ndarray, n_clusters: int, columns: list) -> Dict[str, Any]:
+    """
+    K-Means 聚类（散点图聚类着色），返回标签、中心点、轮廓系数和各簇大小
+    """
+    from sklearn.cluster import KMeans, MiniBatchKMeans
+    from sklearn.metrics import silhouette_score
+    
+    # 执行K-Means聚类（散点图着色只需单精度）
+    data = np.ascontiguousarray(data, dtype=np.float32)
+    n_clusters = min(n_clusters, len(data))
+    
+    # 处理只有一个样本的情况
+    if len(data) == 1:
+        return {
+            "n_clusters": 1,
+            "labels": [0],
+            "centers": [data[0].tolist()],
+            "silhouette_score": None,
+            "cluster_sizes": [1],
+            "columns": columns
+        }
+    
+    if len(data) >= MINIBATCH_KMEANS_MIN_ROWS:
+        # 聚类结果只用于散点图着色，数据量较大时用小批量 K-Means，k-means++ 初始化只跑一次
+        kmeans = MiniBatchKMeans(
+            n_clusters=n_clusters, random_state=42, batch_size=1024, n_init=1, max_iter=100
+        )
+    else:
+        # 尝试使用最新的 sklearn 参数
+        try:
+            kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
+        except TypeError:
+            # 旧版本 sklearn 不支持 n_init 参数
+            kmeans = KMeans(n_clusters=n_clusters, random_state=42)
+    
+    labels = kmeans.fit_predict(data)
+    
+    logger.info(f"Clustering completed: n_clusters={n_clusters}, labels unique={len(np.unique(labels))}")
+    
+    # 计算轮廓系数（聚类质量指标，-1到1，越接近1越好）
+    silhouette = None
+    unique_labels = np.unique(labels)
+    if len(unique_labels) > 1 and len(unique_labels) < len(data) <= SILHOUETTE_MAX_ROWS:
+        try:
+            # 在固定种子的抽样点上估计，避免全量 O(n²) 的距离计算
+            silhouette = float(silhouette_score(
+                data, labels,
+                sample_size=min(SILHOUETTE_SAMPLE_SIZE, len(data)), random_state=42
+            ))
+            logger.info(f"Silhouette score: {silhouette}")
+        except Exception as e:
+            logger.warning(f"Failed to calculate silhouette score: {e}")
+            pass
+    
+    # 统计每个聚类的大小
+    cluster_sizes = np.bincount(labels, minlength=n_clusters)
+    
+    # 处理空簇：找出非空簇并重新映射标签
+    non_empty_indices = np.flatnonzero(cluster_sizes)
+    actual_n_clusters = len(non_empty_indices)
+    
+    if actual_n_clusters < n_clusters:
+        # 创建标签映射：旧标签 -> 新标签（连续的），一次索引完成重映射
+        label_map = np.full(n_clusters, -1, dtype=np.int32)
+        label_map[non_empty_indices] = np.arange(actual_n_clusters)
+        remapped_labels = label_map[labels].tolist()
+        # 只保留非空簇的中心点和大小
+        filtered_centers = kmeans.cluster_centers_[non_empty_indices].tolist()
+        filtered_sizes = cluster_sizes[non_empty_indices].tolist()
+    else:
+        remapped_labels = labels.tolist()
+        filtered_centers = kmeans.cluster_centers_.tolist()
+        filtered_sizes = cluster_sizes.tolist()
+    
+    logger.info(f"Returning clustering result: actual_n_clusters={actual_n_clusters}, sizes={filtered_sizes}")
+    
+    return {
+        "n_clusters": actual_n_clusters,
+        "labels": remapped_labels,
+        "centers": filtered_centers,
+        "silhouette_score": silhouette,
+        "cluster_sizes": filtered_sizes,
+        "columns": columns
+    }
+
+
+def _within_bounds_mask(numeric_df: pd.DataFrame, lower: pd.Series, upper: pd.Series,
+                        inclusive: bool) -> np.ndarray:
+    """
+    逐列比较上下界并累积到一维行掩码，所有列都在界内的行为 True，缺失值视为越界
+    比较结果写入复用的缓冲区，不生成整表大小的中间矩阵
+    """
+    keep = np.ones(len(numeric_df), dtype=bool)
+    buf = np.empty(len(numeric_df), dtype=bool)
+    above, below = (np.greater_equal, np.less_equal) if inclusive else (np.greater, np.less)
+    with np.errstate(invalid="ignore"):
+        for col, lo, hi in zip(numeric_df.columns, lower.to_numpy(), upper.to_numpy()):
+            values = numeric_df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+            above(values, lo, out=buf)
+            keep &= buf
+            below(values, hi, out=buf)
+            keep &= buf
+    return keep
+
+
+def smart_process(df: pd.DataFrame, params: dict) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    智能数据处理
+    返回处理后的 DataFrame 和处理统计，保存文件和写库由调用方完成
+    """
+    logger.info("Starting smart data processing...")
+    
+    # 获取处理配置
+    missing_strategy = params.get("missingValueStrategy", "mean")
+    missing_fill_value = params.get("missingValueFill", "0")
+    duplicate_strategy = params.get("duplicateStrategy", "drop")
+    duplicate_subset = params.get("duplicateSubset") or None
+    outlier_strategy = params.get("outlierStrategy", "none")
+    outlier_method = params.get("outlierMethod", "iqr")
+    outlier_threshold = params.get("outlierThreshold", 1.5)
+    standardization = params.get("standardization", "none")
+    type_conversion = params.get("typeConversion", True)
+    
+    # 记录原始数据状态
+    original_rows = len(df)
+    # 缺失值数 = 单元格总数 - 非空计数，避免生成整表的布尔矩阵
+    original_nulls = int(df.size - df.count().sum())
+    
+    # 数值列只计算一次，后续步骤只删除行或保持类型，不改变列类型
+    numeric_cols = df.select_dtypes(include=['number']).columns
+    
+    # 1. 处理缺失值
+    if missing_strategy != "none":
+        if missing_strategy == "drop":
+            df = df.dropna()
+        elif missing_strategy == "mean":
+            # 一次性按列计算并填充，避免逐列循环
+            df[numeric_cols] = df[numeric_cols].fillna(df[numeric_cols].mean())
+        elif missing_strategy == "median":
+            df[numeric_cols] = df[numeric_cols].fillna(df[numeric_cols].median())
+        elif missing_strategy == "mode":
+            modes = df.mode()
+            if not modes.empty:
+                df = df.fillna(modes.iloc[0])
+        elif missing_strategy == "fill":
+            df = df.fillna(missing_fill_value)
+            # 填充文本值可能使数值列变为 object 类型，需要重新识别
+            numeric_cols = df.select_dtypes(include=['number']).columns
+    
+    # 2. 处理重复值
+    duplicates_removed = 0
+    keep = {"drop": "first", "keep_first": "first", "keep_last": "last"}.get(duplicate_strategy)
+    if keep is not None:
+        # 指定了标识列时只按这些列判重，宽表上只需对少数列做哈希
+        if duplicate_subset:
+            duplicate_subset = [col for col in duplicate_subset if col in df.columns] or None
+        # 一次哈希得到重复行掩码，删除数量直接由掩码统计
+        dup_mask = df.duplicated(subset=duplicate_subset, keep=keep).to_numpy()
+        duplicates_removed = int(dup_mask.sum())
+        if duplicates_removed:
+            df = df[~dup_mask]
+    
+    # 3. 处理异常值
+    outliers_removed = 0
+    if outlier_strategy != "none" and outlier_strategy != "mark":
+        if len(numeric_cols) > 0:
+            # 各列上下界一次性按向量计算，再整体过滤/截断
+            numeric_df = df[numeric_cols]
+            if outlier_method == "iqr":
+                q = numeric_df.quantile([0.25, 0.75])
+                Q1, Q3 = q.loc[0.25], q.loc[0.75]
+                IQR = Q3 - Q1
+                lower = Q1 - outlier_threshold * IQR
+                upper = Q3 + outlier_threshold * IQR
+            else:
+                mean = numeric_df.mean()
+                std = numeric_df.std()
+                lower = mean - outlier_threshold * std
+                upper = mean + outlier_threshold * std
+            
+            if outlier_strategy == "drop":
+                # |z| < 阈值 等价于落在 (mean - 阈值*std, mean + 阈值*std) 开区间内
+                mask = _within_bounds_mask(numeric_df, lower, upper, inclusive=outlier_method == "iqr")
+                outliers_removed = int(len(mask) - mask.sum())
+                if outliers_removed:
+                    df = df[mask]
+            elif outlier_strategy == "clip":
+                df[numeric_cols] = numeric_df.clip(lower, upper, axis=1)
+    
+    # 4. 数据标准化
+    if standardization != "none":
+        from sklearn.preprocessing import StandardScaler, MinMaxScaler
+        
+        if len(numeric_cols) > 0:
+            # 整个数值块转为连续的二维数组，一次完成变换
+            arr = np.ascontiguousarray(df[numeric_cols].to_numpy(dtype=np.float64))
+            if standardization == "zscore":
+                df[numeric_cols] = StandardScaler().fit_transform(arr)
+            elif standardization == "minmax":
+                df[numeric_cols] = MinMaxScaler().fit_transform(arr)
+            elif standardization == "log":
+                # 仅对全部为正数的列取对数
+                positive = (arr > 0).all(axis=0)
+                if positive.any():
+                    log_cols = numeric_cols[positive]
+                    df[log_cols] = np.log1p(arr[:, positive])
+    
+    # 5. 自动类型转换
+    if type_conversion:
+        for col in df.select_dtypes(include=['object']).columns:
+            df[col] = _convert_object_column(df[col])
+    
+    # 计算处理后的状态
+    processed_rows = len(df)
+    processed_nulls = int(df.size - df.count().sum())
+    removed_rows = original_rows - processed_rows
+    fixed_nulls = original_nulls - processed_nulls
+    
+    stats = {
+        "original_rows": original_rows,
+        "processed_rows": processed_rows,
+        "removed_rows": removed_rows,
+        "original_nulls": original_nulls,
+        "processed_nulls": processed_nulls,
+        "fixed_nulls": fixed_nulls,
+        "duplicates_removed": duplicates_removed,
+        "outliers_removed": outliers_removed,
+        "processing_config": {
+            "missing_strategy": missing_strategy,
+            "duplicate_strategy": duplicate_strategy,
+            "outlier_strategy": outlier_strategy,
+            "standardization": standardization
+        }
+    }
+    return df, stats
@@ -79,7 +79,14 @@ class AnalysisService:
             }
         
         # 计算相关系数矩阵
-        corr_matrix = numeric_df.corr().round(4)
+        return AnalysisService.format_correlation(numeric_df.corr())
+    
+    @staticmethod
+    def format_correlation(corr_matrix: pd.DataFrame) -> Dict[str, Any]:
+        """
+        将相关系数矩阵整理为接口返回格式
+        """
+        corr_matrix = corr_matrix.round(4)
         
         # 找出强相关性（绝对值 > 0.7）
         strong_correlations = []
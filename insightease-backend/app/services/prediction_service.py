@@ -4,6 +4,9 @@ import numpy as np
 from typing import Dict, Any, Optional, List
 from datetime import datetime, timedelta
 import json
+import hashlib
+import threading
+from collections import OrderedDict
 
 # 电商大促配置（动态使用当前年份）
 _CURRENT_YEAR = datetime.now().year
@@ -21,6 +24,18 @@ DEFAULT_PROMOTIONS = [
     {"id": "10", "name": "黑五", "date": f"{_CURRENT_YEAR}-11-29", "type": "festival", "impact": 1.6},
 ]
 
+# 已训练的 Prophet 模型缓存（每个进程独立），相同序列再次预测时跳过训练
+_PROPHET_CACHE_SIZE = 16
+_PROPHET_CACHE: "OrderedDict[tuple, Any]" = OrderedDict()
+_PROPHET_CACHE_LOCK = threading.Lock()  # 查找与淘汰成对完成，在线程中调用时也不会互相打断
+
+
+def _series_fingerprint(ts_df: pd.DataFrame) -> str:
+    """按内容计算时间序列的指纹"""
+    hashes = pd.util.hash_pandas_object(ts_df, index=False).to_numpy()
+    return hashlib.sha1(hashes.tobytes()).hexdigest()
+
+
 class PredictionService:
     """预测服务类"""
     
@@ -80,8 +95,6 @@ class PredictionService:
     @staticmethod
     def add_promotion_events(model, promotions: List[Dict], future_df: pd.DataFrame):
         """添加大促事件到 Prophet 模型"""
-        promotion_impact = []
-        
         for promo in promotions:
             promo_date = pd.to_datetime(promo['date'])
             event_name = promo['name']
@@ -94,11 +107,21 @@ class PredictionService:
                 'upper_window': 3 if promo['type'] == 'return' else 1
             })
             model.add_country_holidays(country_name='CN')
+        
+        return PredictionService.calculate_promotion_impact(promotions, future_df)
+    
+    @staticmethod
+    def calculate_promotion_impact(promotions: List[Dict], future_df: pd.DataFrame) -> List[Dict]:
+        """计算落在数据时间范围内的大促影响"""
+        promotion_impact = []
+        
+        for promo in promotions:
+            promo_date = pd.to_datetime(promo['date'])
             
             # 计算影响范围
             if promo_date >= future_df['ds'].min() and promo_date <= future_df['ds'].max():
                 promotion_impact.append({
-                    'name': event_name,
+                    'name': promo['name'],
                     'date': promo['date'],
                     'type': promo['type'],
                     'lift': promo.get('impact', 1.5) * 100 - 100
@@ -216,23 +239,37 @@ class PredictionService:
         # Prophet 需要 ds 和 y 列
         prophet_df = ts_df.rename(columns={date_col: 'ds', value_col: 'y'})
         
-        # 创建并训练模型
-        model = Prophet(
-            yearly_seasonality=True,
-            weekly_seasonality=True,
-            daily_seasonality=False,
-            interval_width=0.95
-        )
-        
-        # 添加大促事件
-        promotion_impact = []
-        if promotions:
-            promotion_impact = PredictionService.add_promotion_events(model, promotions, prophet_df)
-        
-        try:
-            model.fit(prophet_df)
-        except Exception as e:
-            return {"error": f"模型训练失败: {str(e)}"}
+        # 模型只依赖训练数据、频率和是否加入节假日，命中缓存时直接复用已训练的模型
+        cache_key = (_series_fingerprint(prophet_df), freq, bool(promotions))
+        with _PROPHET_CACHE_LOCK:
+            model = _PROPHET_CACHE.get(cache_key)
+            if model is not None:
+                _PROPHET_CACHE.move_to_end(cache_key)
+        if model is not None:
+            promotion_impact = PredictionService.calculate_promotion_impact(promotions, prophet_df)
+        else:
+            # 创建并训练模型
+            model = Prophet(
+                yearly_seasonality=True,
+                weekly_seasonality=True,
+                daily_seasonality=False,
+                interval_width=0.95
+            )
+            
+            # 添加大促事件
+            promotion_impact = []
+            if promotions:
+                promotion_impact = PredictionService.add_promotion_events(model, promotions, prophet_df)
+            
+            try:
+                model.fit(prophet_df)
+            except Exception as e:
+                return {"error": f"模型训练失败: {str(e)}"}
+            
+            with _PROPHET_CACHE_LOCK:
+                _PROPHET_CACHE[cache_key] = model
+                if len(_PROPHET_CACHE) > _PROPHET_CACHE_SIZE:
+                    _PROPHET_CACHE.popitem(last=False)
         
         # 生成未来日期
         future = model.make_future_dataframe(periods=periods, freq=freq)
@@ -710,35 +747,31 @@ class PredictionService:
         forecasts = []
         growth_rates = []
         
-        for col in value_cols:
-            try:
-                if model == "lightgbm":
-                    result = PredictionService.lightgbm_forecast(
-                        df, date_col, col, periods, promotions=promotions
-                    )
-                else:
-                    result = PredictionService.prophet_forecast(
-                        df, date_col, col, periods, promotions=promotions
-                    )
+        # 各列逐个训练：批量预测在分析进程池的子进程中运行，进程池已按核数分摊 CPU，
+        # 再开线程并行只会让线程数成倍放大
+        results = [
+            PredictionService._forecast_single(df, date_col, col, periods, model, promotions)
+            for col in value_cols
+        ]
+        
+        for col, (result, error) in zip(value_cols, results):
+            if error is not None:
+                forecasts.append({
+                    "column": col,
+                    "error": error
+                })
+            elif "error" not in result:
+                # 计算增长率
+                hist_mean = result["statistics"]["historical_mean"]
+                forecast_mean = result["statistics"]["forecast_mean"]
+                growth_rate = ((forecast_mean - hist_mean) / hist_mean * 100) if hist_mean > 0 else 0
                 
-                if "error" not in result:
-                    # 计算增长率
-                    hist_mean = result["statistics"]["historical_mean"]
-                    forecast_mean = result["statistics"]["forecast_mean"]
-                    growth_rate = ((forecast_mean - hist_mean) / hist_mean * 100) if hist_mean > 0 else 0
-                    
-                    forecasts.append({
-                        "column": col,
-                        "forecast": result,
-                        "growth_rate": round(growth_rate, 2)
-                    })
-                    growth_rates.append({"column": col, "rate": growth_rate})
-                    
-            except Exception as e:
                 forecasts.append({
                     "column": col,
-                    "error": str(e)
+                    "forecast": result,
+                    "growth_rate": round(growth_rate, 2)
                 })
+                growth_rates.append({"column": col, "rate": growth_rate})
         
         # 计算汇总统计
         valid_forecasts = [f for f in forecasts if "error" not in f]
@@ -761,6 +794,23 @@ class PredictionService:
             "summary": summary
         }
     
+    @staticmethod
+    def _forecast_single(df: pd.DataFrame, date_col: str, value_col: str, periods: int,
+                         model: str, promotions: List[Dict] = None):
+        """批量预测中的单列预测，返回 (预测结果, 异常信息)"""
+        try:
+            if model == "lightgbm":
+                result = PredictionService.lightgbm_forecast(
+                    df, date_col, value_col, periods, promotions=promotions
+                )
+            else:
+                result = PredictionService.prophet_forecast(
+                    df, date_col, value_col, periods, promotions=promotions
+                )
+            return result, None
+        except Exception as e:
+            return None, str(e)
+    
     @staticmethod
     def auto_forecast(df: pd.DataFrame, value_col: str, periods: int = 30,
                       model: str = "prophet", **kwargs) -> Dict[str, Any]:
@@ -433,10 +433,12 @@ class ReportService:
         title: str,
         dataset_info: Dict[str, Any],
         analysis_results: List[Dict[str, Any]],
-        ai_summary: str = None
-    ) -> bytes:
+        ai_summary: str = None,
+        output: Optional[str] = None
+    ) -> Optional[bytes]:
         """
         生成PDF报告
+        指定 output（文件路径）时直接写入文件并返回 None，不在内存中保留整个 PDF
         """
         try:
             from weasyprint import HTML, CSS
@@ -448,6 +450,9 @@ class ReportService:
             
             # 转换为PDF
             html = HTML(string=html_content)
+            if output is not None:
+                html.write_pdf(output)
+                return None
             pdf_bytes = html.write_pdf()
             
             return pdf_bytes
@@ -463,10 +468,12 @@ class ReportService:
         title: str,
         dataset_info: Dict[str, Any],
         analysis_results: List[Dict[str, Any]],
-        ai_summary: str = None
-    ) -> bytes:
+        ai_summary: str = None,
+        output: Optional[str] = None
+    ) -> Optional[bytes]:
         """
         生成Word报告
+        指定 output（文件路径）时直接保存到文件并返回 None
         """
         try:
             from docx import Document
@@ -558,6 +565,10 @@ class ReportService:
             footer_run.font.size = Pt(9)
             footer_run.font.color.rgb = RGBColor(128, 128, 128)
             
+            if output is not None:
+                doc.save(output)
+                return None
+            
             # 保存到内存
             buffer = BytesIO()
             doc.save(buffer)
@@ -0,0 +1,284 @@
+"""
+大文件流式分析服务
+按块读取 CSV，逐块累积统计量，峰值内存只与块大小相关
+支持：描述性统计、相关性分析
+"""
+import os
+import pandas as pd
+import numpy as np
+from typing import Dict, Any, Iterator, List
+
+from app.services.analysis_service import AnalysisService
+
+# 文件超过该大小时，描述性统计/相关性分析改为分块计算
+STREAMING_MIN_FILE_SIZE = 256 * 1024 * 1024
+# 每块读取的行数
+STREAMING_CHUNK_SIZE = 1_000_000
+# 分位数估计保留的最大样本数（每列）
+QUANTILE_SAMPLE_SIZE = 200_000
+# 支持流式计算的分析类型
+STREAMING_ANALYSIS_TYPES = ("descriptive", "correlation")
+
+
+def should_stream(file_path: str, analysis_type: str) -> bool:
+    """判断是否对该文件使用流式分析"""
+    return (
+        analysis_type in STREAMING_ANALYSIS_TYPES
+        and file_path.endswith(".csv")
+        and os.path.getsize(file_path) >= STREAMING_MIN_FILE_SIZE
+    )
+
+
+def stream_frames(file_path: str, chunksize: int = STREAMING_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """
+    分块读取 CSV 文件
+    表头检测与 read_csv_with_auto_header 保持一致，无表头时列名为 col_0, col_1, ...
+    """
+    from app.api.v1.endpoints.datasets import _has_header
+    
+    has_header = _has_header(file_path)
+    reader = pd.read_csv(
+        file_path,
+        header=0 if has_header else None,
+        chunksize=chunksize,
+        engine="c",
+        low_memory=False
+    )
+    with reader:
+        for chunk in reader:
+            if not has_header:
+                chunk.columns = [f"col_{i}" for i in range(len(chunk.columns))]
+            yield chunk
+
+
+class _StrideSampler:
+    """
+    定长系统抽样：样本超过上限时隔一取一并把步长翻倍，
+    内存有界且结果确定，用于估计大文件的分位数
+    """
+    
+    def __init__(self, capacity: int = QUANTILE_SAMPLE_SIZE):
+        self.capacity = capacity
+        self.stride = 1
+        self.parts: List[np.ndarray] = []
+        self.size = 0
+    
+    def add(self, values: np.ndarray):
+        values = values[::self.stride]
+        self.parts.append(values)
+        self.size += len(values)
+        while self.size > self.capacity:
+            merged = np.concatenate(self.parts)[::2]
+            self.parts = [merged]
+            self.size = len(merged)
+            self.stride *= 2
+    
+    def values(self) -> np.ndarray:
+        return np.concatenate(self.parts) if self.parts else np.array([], dtype=float)
+
+
+class StreamingAnalysisService:
+    """大文件流式分析服务类"""
+    
+    @staticmethod
+    def analyze_file(file_path: str, analysis_type: str) -> Dict[str, Any]:
+        """按分析类型执行流式分析"""
+        if analysis_type == "descriptive":
+            return StreamingAnalysisService.descriptive_analysis(file_path)
+        elif analysis_type == "correlation":
+            return StreamingAnalysisService.correlation_analysis(file_path)
+        return {"error": f"不支持流式计算的分析类型: {analysis_type}"}
+    
+    @staticmethod
+    def descriptive_analysis(file_path: str) -> Dict[str, Any]:
+        """
+        描述性统计（流式）
+        计数、均值、标准差、偏度、峰度由各块的幂和精确合并；
+        中位数和四分位数由系统抽样估计
+        """
+        total_rows = 0
+        columns = None
+        dtypes = {}
+        numeric_cols = []
+        categorical_cols = set()
+        null_counts = None
+        # 以首块均值为平移量累积 1~4 阶幂和，减小大均值时的精度损失
+        shift = {}
+        power_sums = {}
+        counts = {}
+        mins = {}
+        maxs = {}
+        samplers = {}
+        value_counts = {}
+        
+        for chunk in stream_frames(file_path):
+            if columns is None:
+                columns = list(chunk.columns)
+                dtypes = {col: str(chunk[col].dtype) for col in columns}
+                numeric_cols = [col for col in columns if pd.api.types.is_numeric_dtype(chunk[col])]
+                categorical_cols = {
+                    col for col in columns
+                    if col not in numeric_cols and pd.api.types.is_string_dtype(chunk[col])
+                }
+                null_counts = pd.Series(0, index=columns, dtype="int64")
+                for col in numeric_cols:
+                    first = pd.to_numeric(chunk[col], errors="coerce").astype(float)
+                    shift[col] = float(first.mean()) if first.notna().any() else 0.0
+                    power_sums[col] = np.zeros(4)
+                    counts[col] = 0
+                    mins[col] = np.inf
+                    maxs[col] = -np.inf
+                    samplers[col] = _StrideSampler()
+            
+            total_rows += len(chunk)
+            null_counts += chunk.isna().sum()
+            
+            for col in columns:
+                if col in power_sums:
+                    # 后续块类型不一致时按数值强制转换
+                    values = pd.to_numeric(chunk[col], errors="coerce").astype(float).dropna().to_numpy()
+                    if len(values) == 0:
+                        continue
+                    d = values - shift[col]
+                    d2 = d * d
+                    power_sums[col] += (d.sum(), d2.sum(), (d2 * d).sum(), (d2 * d2).sum())
+                    counts[col] += len(values)
+                    mins[col] = min(mins[col], values.min())
+                    maxs[col] = max(maxs[col], values.max())
+                    samplers[col].add(values)
+                elif col in categorical_cols:
+                    vc = chunk[col].value_counts()
+                    value_counts[col] = vc if col not in value_counts else value_counts[col].add(vc, fill_value=0)
+        
+        result = {
+            "total_rows": total_rows,
+            "total_columns": len(columns or []),
+            "column_stats": [],
+            "streamed": True
+        }
+        
+        for col in columns or []:
+            null_count = int(null_counts[col])
+            col_info = {
+                "name": str(col),
+                "dtype": dtypes[col],
+                "non_null_count": total_rows - null_count,
+                "null_count": null_count,
+                "null_percentage": round(null_count / total_rows * 100, 2) if total_rows else 0.0
+            }
+            
+            if col in power_sums:
+                col_info.update(StreamingAnalysisService._numeric_stats(
+                    counts[col], shift[col], power_sums[col], mins[col], maxs[col], samplers[col]
+                ))
+            elif col in categorical_cols:
+                vc = value_counts.get(col, pd.Series(dtype="int64")).sort_values(ascending=False, kind="stable")
+                col_info.update({
+                    "type": "categorical",
+                    "unique_count": int(len(vc)),
+                    "most_common": str(vc.index[0]) if not vc.empty else None,
+                    "top_values": {str(k): int(v) for k, v in vc.head(10).items()}
+                })
+            
+            result["column_stats"].append(col_info)
+        
+        return result
+    
+    @staticmethod
+    def _numeric_stats(n: int, shift: float, power_sums: np.ndarray,
+                       col_min: float, col_max: float, sampler: _StrideSampler) -> Dict[str, Any]:
+        """由幂和计算数值列统计量（与 pandas 的无偏估计一致）"""
+        if n == 0:
+            return {
+                "type": "numeric",
+                "mean": None, "median": None, "std": None, "min": None, "max": None,
+                "q1": None, "q3": None, "skewness": None, "kurtosis": None
+            }
+        
+        s1, s2, s3, s4 = power_sums / n
+        # 中心矩
+        m2 = s2 - s1 ** 2
+        m3 = s3 - 3 * s1 * s2 + 2 * s1 ** 3
+        m4 = s4 - 4 * s1 * s3 + 6 * s1 ** 2 * s2 - 3 * s1 ** 4
+        
+        std = np.sqrt(m2 * n / (n - 1)) if n > 1 else np.nan
+        if n < 3:
+            skew = np.nan
+        elif m2 <= 0:
+            skew = 0.0
+        else:
+            skew = np.sqrt(n * (n - 1)) / (n - 2) * m3 / m2 ** 1.5
+        if n < 4:
+            kurt = np.nan
+        elif m2 <= 0:
+            kurt = 0.0
+        else:
+            g2 = m4 / m2 ** 2 - 3
+            kurt = ((n + 1) * g2 + 6) * (n - 1) / ((n - 2) * (n - 3))
+        
+        q1, median, q3 = np.quantile(sampler.values(), [0.25, 0.5, 0.75])
+        
+        return {
+            "type": "numeric",
+            "mean": round(float(shift + s1), 4),
+            "median": round(float(median), 4),
+            "std": round(float(std), 4),
+            "min": round(float(col_min), 4),
+            "max": round(float(col_max), 4),
+            "q1": round(float(q1), 4),
+            "q3": round(float(q3), 4),
+            "skewness": round(float(skew), 4),
+            "kurtosis": round(float(kurt), 4)
+        }
+    
+    @staticmethod
+    def correlation_analysis(file_path: str) -> Dict[str, Any]:
+        """
+        相关性分析（流式）
+        逐块累积成对完整样本的计数、一阶和、二阶和与交叉积，结果与 DataFrame.corr 一致
+        """
+        numeric_cols = None
+        shift = None
+        n = sx = sxx = sxy = None
+        
+        for chunk in stream_frames(file_path):
+            if numeric_cols is None:
+                numeric_cols = chunk.select_dtypes(include=[np.number]).columns.tolist()
+                if len(numeric_cols) < 2:
+                    break
+                shift = chunk[numeric_cols].mean().fillna(0).to_numpy()
+                k = len(numeric_cols)
+                n, sx, sxx, sxy = (np.zeros((k, k)) for _ in range(4))
+            
+            values = chunk[numeric_cols].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float) - shift
+            mask = ~np.isnan(values)
+            m = mask.astype(float)
+            x = np.where(mask, values, 0.0)
+            # n[i, j]：第 i、j 列同时非空的行数；sx[i, j]：这些行上第 i 列之和
+            n += m.T @ m
+            sx += x.T @ m
+            sxx += (x * x).T @ m
+            sxy += x.T @ x
+        
+        if numeric_cols is None or len(numeric_cols) < 2:
+            return {
+                "message": "数据中没有足够的数值型列进行相关性分析",
+                "correlation_matrix": {},
+                "strong_correlations": []
+            }
+        
+        with np.errstate(divide="ignore", invalid="ignore"):
+            sy = sx.T
+            syy = sxx.T
+            cov = n * sxy - sx * sy
+            var_x = n * sxx - sx ** 2
+            var_y = n * syy - sy ** 2
+            corr = cov / np.sqrt(var_x * var_y)
+        corr = np.clip(corr, -1.0, 1.0)
+        # 与 DataFrame.corr 一致：方差为 0 的列对角线为 NaN
+        np.fill_diagonal(corr, np.where(np.diag(var_x) > 0, 1.0, np.nan))
+        
+        corr_matrix = pd.DataFrame(corr, index=numeric_cols, columns=numeric_cols)
+        result = AnalysisService.format_correlation(corr_matrix)
+        result["streamed"] = True
+        return result
@@ -6,4 +6,4 @@ if __name__ == "__main__":
     os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
     print(f"启动 {settings.PROJECT_NAME} v{settings.VERSION}")
     print(f"API文档: http://localhost:8000/docs")
-    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True, backlog=2048)
\ No newline at end of file